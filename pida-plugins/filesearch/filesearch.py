@@ -26,7 +26,7 @@ from pida.core.actions import ActionsConfig
 from pida.core.features import FeaturesConfig
 from pida.core.actions import TYPE_REMEMBER_TOGGLE
 from pida.core.options import OptionsConfig
-from pygtkhelpers.gthreads import GeneratorTask
+from pida.utils.gthreads import BatchedGeneratorTask
 
 from filters import ValidationError, FileNameMatchesFilter
 from search import get_filters, do_search, SearchMatch
@@ -63,10 +63,10 @@ class SearchView(PidaView):
         self.new_filter(FileNameMatchesFilter)
 
         # task for asynchrounus searching
-        # ``append_to_match_list`` is called if a match was found
+        # ``append_to_match_list`` is called with batches of found matches
         # ``search_finished`` is called at the end of search
-        self.task = GeneratorTask(do_search, self.append_to_match_list,
-                                  self.search_finished)
+        self.task = BatchedGeneratorTask(do_search, self.append_to_match_list,
+                                         self.search_finished)
 
 
     def on_add_button__clicked(self, btn):
@@ -174,10 +174,10 @@ class SearchView(PidaView):
         if count is None:
             self.match_count += 1
         else:
-            self.match_count = 0
+            self.match_count = count
         self.count_label.set_text('%s files' % self.match_count)
 
-    def append_to_match_list(self, dirpath, filename):
+    def append_to_match_list(self, matches):
         #for lister in self.file_listers:
         #    # XXX: this loads all files inside the directory and filters the
         #    #      file later --> dirty hack
@@ -189,7 +189,19 @@ class SearchView(PidaView):
         #            **kwargs
         #        )
         #    GeneratorTask(lister, _f).start(dirpath)
-        self.add_or_update_file(filename, dirpath, 'normal')
+        new = []
+        for dirpath, filename in matches:
+            entry = self.entries.setdefault(path.join(dirpath, filename),
+                                            SearchMatch(dirpath, filename,
+                                                        manager=self))
+            entry.state = 'normal'
+            if entry.visible:
+                self.match_list.update(entry)
+            else:
+                entry.visible = True
+                new.append(entry)
+        self.match_list.extend(new)
+        self.update_match_count(self.match_count + len(new))
 
     def add_or_update_file(self, name, basepath, state):
         entry = self.entries.setdefault(path.join(basepath, name),
@@ -24,7 +24,6 @@ from pida.core.actions import (ActionsConfig, TYPE_NORMAL)
 from pida.core.options import OptionsConfig
 from pida.ui.views import PidaView, WindowConfig
 from pida.services.language import DOCTYPES
-from pida.core.indexer import Result
 from pygtkhelpers.gthreads import gcall
 import time
 
@@ -86,30 +85,23 @@ class QOpenView(PidaView):
             else:
                 fall.append(tok)
 
-        def do_filter(item):
-            if len(self.olist) > 200:
-                Result(abort=True)
-            if not len(item.basename) or not len(item.relpath):
-                return
-            if "/." in item.relpath or item.relpath[0] == ".":
-                return
+        def accept(item):
+            relpath = item.relpath
+            if "/." in relpath or relpath[0] == ".":
+                return False
             for chk in filters:
-                if not chk(item.basename, item.relpath, ''):
-                    return
-            if item.is_dir:
-                return
-            if all((x in item.relpath for x in fall)) and \
-               all((x in item.basename for x in fnames)):
-                if len(ftypes):
-                    if item.doctype in ftypes:
-                        return Result(accept=True)
-                else:
-                    return Result(accept=True)
+                if not chk(item.basename, relpath, ''):
+                    return False
+            if not all(x in item.basename for x in fnames):
+                return False
+            return not ftypes or item.doctype in ftypes
 
         project = self.svc.boss.cmd('project', 'get_current_project')
         if not project:
             return
-        for result in project.indexer.query(do_filter):
+        query = " ".join(fall or fnames)
+        for result in project.indexer.finder.search(
+                query, limit=self.svc.opt('max_results'), accept=accept):
             self.olist.append(result)
 
         return False
@@ -188,6 +180,14 @@ class QopenOptionsConfig(OptionsConfig):
             _('Start search after n milliseconds'),
         )
 
+        self.create_option(
+            'max_results',
+            _('Maximum results'),
+            int,
+            200,
+            _('Show only the n best matching files'),
+        )
+
 
 class QopenActionsConfig(ActionsConfig):
 
@@ -21,7 +21,8 @@
 #SOFTWARE.
 
 
-from pygtkhelpers.gthreads import GeneratorTask, gcall
+from pygtkhelpers.gthreads import gcall
+from pida.utils.gthreads import BatchedGeneratorTask
 from pygtkhelpers.ui.objectlist import ObjectList, Column
 
 # PIDA Imports
@@ -70,6 +71,9 @@ class TodoView(PidaView):
     def add_item(self, todo, line, marker):
         self.todo_list.append(TodoItem(todo, line, marker))
 
+    def add_items(self, rows):
+        self.todo_list.extend(TodoItem(*row) for row in rows)
+
     def on_todo_list__item_activated(self, olist, item):
         self.svc.boss.editor.cmd('goto_line', line=item.line)
 
@@ -155,13 +159,14 @@ class Todo(Service):
                     todo = post.strip().strip(':').strip()
                     yield (todo, i + 1, marker)
 
-    def add_todo_item(self, todo, line, marker):
-        self._view.add_item(todo, line, marker)
+    def add_todo_items(self, rows):
+        self._view.add_items(rows)
 
     def set_current_document(self, document):
         self._current = document
         if self._current is not None:
-            task = GeneratorTask(self.check_current, self.add_todo_item)
+            task = BatchedGeneratorTask(self.check_current,
+                                        self.add_todo_items)
             task.start()
 
     def stop(self):
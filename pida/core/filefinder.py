@@ -0,0 +1,355 @@
+# -*- coding: utf-8 -*-
+# vim:set shiftwidth=4 tabstop=4 expandtab textwidth=79:
+"""
+    pida.core.filefinder
+    ~~~~~~~~~~~~~~~~~~~~
+
+    Ranked fuzzy matching of project files, used by quick open.
+
+    Every whitespace separated token of a query has to match the relative
+    path of a file as a case insensitive subsequence. Results are ranked by
+    the weakest match of their tokens:
+
+    * the basename starts with the token
+    * the basename contains the token
+    * the path contains the token
+    * the token is only a subsequence of the path
+
+    Inside those tiers, tokens starting at path segment boundaries and
+    shorter paths win.
+
+    :license: GPL2 or later
+    :copyright: 2010 by The PIDA Project
+"""
+import os
+import re
+import heapq
+from array import array
+from bisect import bisect_left, insort
+from itertools import compress, ifilter, imap, islice, izip, repeat
+from operator import contains, itemgetter
+
+from pida.core.indexer import FileInfo, FLAG_DIR, FLAG_FILE
+
+TIER_FUZZY = 1
+TIER_PATH = 2
+TIER_BASENAME = 3
+TIER_PREFIX = 4
+
+SEPARATORS = frozenset(os.sep + '_-. ')
+
+# rebuild the trigram postings once that many of them are stale
+STALE_LIMIT = 50000
+
+# at most that many candidates get scored, shorter paths are preferred
+RANK_POOL = 2000
+
+
+def trigrams(text):
+    return set(text[i:i+3] for i in xrange(len(text) - 2))
+
+
+def subsequence_regex(token):
+    # a[^b]*b[^c]*c never backtracks, unlike a.*?b.*?c
+    parts = []
+    for char, next_char in zip(token, token[1:]):
+        parts.append('%s[^%s]*' % (re.escape(char), re.escape(next_char)))
+    parts.append(re.escape(token[-1]))
+    return re.compile(''.join(parts))
+
+
+def is_refinement(old, new):
+    """
+    Returns True if every match of the tokens `new` also matches `old`
+    """
+    if len(new) < len(old) or not old:
+        return False
+    for i, token in enumerate(old):
+        if i == len(old) - 1:
+            if not new[i].startswith(token):
+                return False
+        elif new[i] != token:
+            return False
+    return True
+
+
+def fuzzy_bonus(key, token):
+    """Number of token characters that match at segment boundaries"""
+    bonus = 0
+    pos = 0
+    for char in token:
+        pos = key.find(char, pos)
+        if pos == 0 or key[pos - 1] in SEPARATORS:
+            bonus += 1
+        pos += 1
+    return bonus
+
+
+def score(key, tokens):
+    """
+    Returns a sortable score for the lower case path `key`, higher is
+    better
+    """
+    base = key.rfind(os.sep) + 1
+    tier = TIER_PREFIX
+    bonus = 0
+    for token in tokens:
+        pos = key.find(token, base)
+        if pos == base:
+            current = TIER_PREFIX
+        elif pos > base:
+            current = TIER_BASENAME
+            if key[pos - 1] in SEPARATORS:
+                bonus += 1
+        else:
+            pos = key.find(token)
+            if pos >= 0:
+                current = TIER_PATH
+                if pos == 0 or key[pos - 1] in SEPARATORS:
+                    bonus += 1
+            else:
+                current = TIER_FUZZY
+                bonus += fuzzy_bonus(key, token)
+        tier = min(tier, current)
+    return tier, bonus, -len(key)
+
+
+class _LastSearch(object):
+    """
+    Matches of the previous query, the next query only has to look at them
+    if it refines the previous one. `fuzzy` is None if the fuzzy scan was
+    skipped.
+    """
+    __slots__ = 'tokens', 'substring', 'fuzzy'
+
+    def __init__(self, tokens, substring, fuzzy):
+        self.tokens = tokens
+        self.substring = substring
+        self.fuzzy = fuzzy
+
+
+class FileFinder(object):
+    """
+    Fuzzy file finder on top of the :class:`~pida.core.indexer.FileStore`
+    of an indexer.
+
+    The lookup tables are built on the first search and then kept up to
+    date by observing the store:
+
+    * the lower case path of every file
+    * a sorted list of lower case basenames for prefix lookups
+    * trigram postings for substring lookups, directories post the trigrams
+      of their path and files only the ones around their basename, so the
+      directory part of a path is indexed once
+
+    Trigram postings are never shrunk when files go away, every candidate
+    they return is verified against the path.
+
+    Filtering is done with iterator pipelines so the per file work stays in
+    C, only the best candidates are scored in python.
+    """
+
+    def __init__(self, store):
+        self.store = store
+        store.observers.append(self)
+        self.store_reset()
+
+    def store_reset(self):
+        self._built = False
+        self._keys = {}
+        self._basenames = []
+        self._trigrams = {}
+        self._dir_trigrams = {}
+        self._by_length = None
+        self._stale = 0
+        self._last = None
+
+    def _build(self):
+        self.store_reset()
+        store = self.store
+        for id_, relpath in store.walk():
+            if store.flags[id_] & FLAG_FILE:
+                self._add(id_, relpath)
+            elif store.flags[id_] & FLAG_DIR:
+                self._add_dir(id_, relpath)
+        self._basenames.sort()
+        self._built = True
+
+    def _add(self, id_, relpath, keep_sorted=False):
+        key = relpath.lower()
+        self._keys[id_] = key
+        entry = (key[key.rfind(os.sep) + 1:], id_)
+        if keep_sorted:
+            insort(self._basenames, entry)
+        else:
+            self._basenames.append(entry)
+        # the trigrams inside the dirname are posted by the directory
+        base = len(key) - len(entry[0])
+        self._post(self._trigrams, id_, key[max(base - 2, 0):])
+
+    def _add_dir(self, id_, relpath):
+        self._post(self._dir_trigrams, id_, relpath.lower())
+
+    def _post(self, postings, id_, text):
+        for tri in trigrams(text):
+            try:
+                postings[tri].append(id_)
+            except KeyError:
+                postings[tri] = array('i', (id_,))
+
+    def entry_added(self, id_):
+        if not self._built:
+            return
+        flags = self.store.flags[id_]
+        if flags & FLAG_FILE:
+            self._add(id_, self.store.relpath(id_), keep_sorted=True)
+            self._by_length = None
+            self._last = None
+        elif flags & FLAG_DIR:
+            self._add_dir(id_, self.store.relpath(id_))
+
+    def entry_removed(self, id_):
+        if not self._built:
+            return
+        key = self._keys.pop(id_, None)
+        if key is None:
+            return
+        entry = (key[key.rfind(os.sep) + 1:], id_)
+        pos = bisect_left(self._basenames, entry)
+        if pos < len(self._basenames) and self._basenames[pos] == entry:
+            del self._basenames[pos]
+        self._by_length = None
+        self._last = None
+        self._stale += len(key)
+        if self._stale > STALE_LIMIT:
+            # postings of reused ids would keep growing otherwise
+            self._built = False
+
+    def _shortest(self, ids, accept):
+        """
+        Returns at most RANK_POOL accepted ids, preferring short paths
+        """
+        if accept is not None:
+            store = self.store
+            accept_id = lambda id_: accept(FileInfo(store, id_))
+        if len(ids) <= RANK_POOL:
+            if accept is None:
+                return list(ids)
+            return filter(accept_id, ids)
+        if self._by_length is None:
+            keys = self._keys
+            ids_ = keys.keys()
+            self._by_length = [id_ for length, id_ in
+                               sorted(izip(imap(len, keys.values()), ids_))]
+        wanted = ids if isinstance(ids, set) else set(ids)
+        pool = ifilter(wanted.__contains__, self._by_length)
+        if accept is not None:
+            pool = ifilter(accept_id, pool)
+        return list(islice(pool, RANK_POOL))
+
+    def _rank(self, ids, tokens, limit, accept):
+        keys = self._keys
+        best = heapq.nlargest(limit, self._shortest(ids, accept),
+                              key=lambda id_: score(keys[id_], tokens))
+        return [FileInfo(self.store, id_) for id_ in best]
+
+    def _prefix_matches(self, token):
+        basenames = self._basenames
+        start = bisect_left(basenames, (token,))
+        if isinstance(token, unicode):
+            end = bisect_left(basenames, (token + u'\uffff',))
+        else:
+            end = bisect_left(basenames, (token + '\xff',))
+        return map(itemgetter(1), basenames[start:end])
+
+    def _substring_matches(self, tokens, pool):
+        keys = self._keys
+        longest = max(tokens, key=len)
+        if pool is None and len(longest) >= 3:
+            pool = self._trigram_candidates(longest)
+        if pool is None:
+            ids = keys.keys()
+            values = keys.values()
+        else:
+            ids = filter(keys.__contains__, pool)
+            values = map(keys.__getitem__, ids)
+        for token in tokens:
+            selectors = list(imap(contains, values, repeat(token)))
+            ids = list(compress(ids, selectors))
+            values = list(compress(values, selectors))
+        return ids
+
+    def _trigram_candidates(self, token):
+        """
+        Returns the ids of files that may contain `token`, using the
+        trigram of it with the fewest candidates
+        """
+        children = self.store.children
+        files_per_dir = len(self._keys) / float(len(children) or 1)
+        best = None
+        for tri in trigrams(token):
+            files = self._trigrams.get(tri, ())
+            dirs = self._dir_trigrams.get(tri, ())
+            if not files and not dirs:
+                return set()
+            cost = len(files) + len(dirs) * files_per_dir
+            if best is None or cost < best[0]:
+                best = cost, files, dirs
+        pool = set(best[1])
+        for dir_id in set(best[2]):
+            # directory ids are not files, the caller drops them
+            pool.update(children.get(dir_id, {}).itervalues())
+        return pool
+
+    def _fuzzy_matches(self, tokens, pool):
+        keys = self._keys
+        if pool is None:
+            ids = keys.keys()
+            values = keys.values()
+        else:
+            ids = filter(keys.__contains__, pool)
+            values = map(keys.__getitem__, ids)
+        for token in sorted(tokens, key=len, reverse=True):
+            selectors = map(subsequence_regex(token).search, values)
+            ids = list(compress(ids, selectors))
+            values = list(compress(values, selectors))
+        return ids
+
+    def search(self, query, limit=200, accept=None):
+        """
+        Returns up to `limit` :class:`~pida.core.indexer.FileInfo` views of
+        files matching `query`, best match first.
+
+        :param accept: optional callable getting a FileInfo, files it
+                       returns a false value for are skipped
+        """
+        if not self._built:
+            self._build()
+        tokens = query.lower().split()
+        if not tokens:
+            return self._rank(self._keys.keys(), tokens, limit, accept)
+
+        last = self._last
+        if last is not None and is_refinement(last.tokens, tokens):
+            substring_pool, fuzzy_pool = last.substring, last.fuzzy
+        else:
+            substring_pool = fuzzy_pool = None
+
+        # a full tier of better matches makes the slower scans pointless
+        if len(tokens) == 1 and substring_pool is None:
+            found = self._prefix_matches(tokens[0])
+            if len(found) >= limit:
+                ranked = self._rank(found, tokens, limit, accept)
+                if len(ranked) >= limit:
+                    self._last = None
+                    return ranked
+        substring = self._substring_matches(tokens, substring_pool)
+        if len(substring) >= limit:
+            ranked = self._rank(substring, tokens, limit, accept)
+            if len(ranked) >= limit:
+                self._last = _LastSearch(tokens, substring, fuzzy_pool)
+                return ranked
+
+        fuzzy = self._fuzzy_matches(tokens, fuzzy_pool)
+        self._last = _LastSearch(tokens, substring, fuzzy)
+        return self._rank(fuzzy, tokens, limit, accept)
@@ -1,7 +1,8 @@
-
 import os
+import stat
 import fnmatch
-from collections import defaultdict
+from array import array
+from collections import Mapping
 from itertools import chain
 try:
     import cPickle as pickle
@@ -9,8 +10,26 @@ except ImportError:
     import pickle
 
 from pida.core.log import Log
+from pida.utils.descriptors import cached_property
+
+# locale
+from pida.core.locale import Locale
+locale = Locale('pida')
+_ = locale.gettext
 
 CACHE_NAME = "FILECACHE"
+# bump this whenever the layout of the saved snapshot changes
+CACHE_VERSION = 3
+
+# entry flags of the FileStore
+FLAG_USED = 1
+FLAG_DIR = 2
+FLAG_FILE = 4
+# set by the grepper when it finds null bytes, cleared by any stat update
+FLAG_BINARY = 8
+
+# str.translate table dropping FLAG_BINARY from a dumped flags column
+_DROP_BINARY = ''.join(chr(i & ~FLAG_BINARY) for i in xrange(256))
 
 
 class Result(object):
@@ -22,135 +41,579 @@ class Result(object):
         self.abort = abort
 
 
-class FileInfo(object):
-    def __init__(self, path, relpath):
-        self.relpath = relpath
-        self.basename = os.path.basename(relpath)
-        self.dirname = os.path.dirname(relpath)
-        self.ext = os.path.splitext(self.basename)[1]
-        self.doctype = None
-        self.is_dir = os.path.isdir(path)
-        self.is_file = os.path.isfile(path)
-        self.mtime = os.path.getmtime(path)
+def flags_for_stat(st):
+    flags = FLAG_USED
+    if stat.S_ISDIR(st.st_mode):
+        flags |= FLAG_DIR
+    elif stat.S_ISREG(st.st_mode):
+        flags |= FLAG_FILE
+    return flags
+
+
+class FileStore(object):
+    """
+    Columnar storage of the file index.
+
+    Every entry is an integer id into parallel arrays. Names are interned
+    and an entry only knows the id of its parent, so no path string is
+    stored per entry.
+
+    Observers get `entry_added(id)`, `entry_removed(id)` and `store_reset()`
+    calls to keep derived indexes up to date.
+    """
+
+    def __init__(self):
+        self.observers = []
+        self.clear()
+
+    def clear(self):
+        self.root = None
+        self.names = []
+        self.parents = array('i')
+        self.mtimes = array('d')
+        self.flags = array('B')
+        self.doctypes = array('H')
+        self.doctype_names = [None]
+        self._doctype_ids = {None: 0}
+        # directory id -> {name: id}
         self.children = {}
+        # name -> [id, ...]
+        self.by_name = {}
+        self._free = []
+        for observer in self.observers:
+            observer.store_reset()
+
+    def __len__(self):
+        return len(self.names) - len(self._free)
+
+    def _doctype_id(self, doctype):
+        try:
+            return self._doctype_ids[doctype]
+        except KeyError:
+            self.doctype_names.append(doctype)
+            self._doctype_ids[doctype] = len(self.doctype_names) - 1
+            return self._doctype_ids[doctype]
+
+    def add(self, parent, name, flags, mtime, doctype=None):
+        """
+        Add a new entry below the directory `parent` and return its id.
+
+        A parent of None creates the root entry.
+        """
+        if isinstance(name, str):
+            name = intern(name)
+        doctype = self._doctype_id(doctype)
+        if parent is None:
+            parent = -1
+        if self._free:
+            id_ = self._free.pop()
+            self.names[id_] = name
+            self.parents[id_] = parent
+            self.mtimes[id_] = mtime
+            self.flags[id_] = flags
+            self.doctypes[id_] = doctype
+        else:
+            id_ = len(self.names)
+            self.names.append(name)
+            self.parents.append(parent)
+            self.mtimes.append(mtime)
+            self.flags.append(flags)
+            self.doctypes.append(doctype)
+        if parent < 0:
+            self.root = id_
+        else:
+            self.children[parent][name] = id_
+        if flags & FLAG_DIR:
+            self.children[id_] = {}
+        self.by_name.setdefault(name, []).append(id_)
+        for observer in self.observers:
+            observer.entry_added(id_)
+        return id_
+
+    def remove(self, id_):
+        """Remove an entry and everything below it"""
+        parent = self.parents[id_]
+        if parent >= 0:
+            self.children[parent].pop(self.names[id_], None)
+        elif id_ == self.root:
+            self.root = None
+        self._remove(id_)
+
+    def _remove(self, id_):
+        for child in self.children.pop(id_, {}).itervalues():
+            self._remove(child)
+        for observer in self.observers:
+            observer.entry_removed(id_)
+        name = self.names[id_]
+        same = self.by_name.get(name)
+        if same is not None:
+            same.remove(id_)
+            if not same:
+                del self.by_name[name]
+        self.names[id_] = None
+        self.flags[id_] = 0
+        self._free.append(id_)
+
+    def set_stat(self, id_, flags, mtime):
+        self.flags[id_] = flags
+        self.mtimes[id_] = mtime
+
+    def lookup(self, relpath):
+        """Returns the id of a relative path or None"""
+        id_ = self.root
+        if not relpath or id_ is None:
+            return id_
+        children = self.children
+        for part in relpath.split(os.sep):
+            kids = children.get(id_)
+            if kids is None:
+                return None
+            id_ = kids.get(part)
+            if id_ is None:
+                return None
+        return id_
+
+    def relpath(self, id_):
+        parts = []
+        names = self.names
+        parents = self.parents
+        while id_ != self.root and id_ >= 0:
+            parts.append(names[id_])
+            id_ = parents[id_]
+        parts.reverse()
+        return os.sep.join(parts)
+
+    def walk(self, id_=None, relpath=''):
+        """
+        Iterate (id, relpath) over the entries below `id_` in sorted order,
+        starting with `id_` itself
+        """
+        if id_ is None:
+            id_ = self.root
+            if id_ is None:
+                return
+        stack = [(id_, relpath)]
+        children = self.children
+        while stack:
+            id_, relpath = stack.pop()
+            yield id_, relpath
+            kids = children.get(id_)
+            if kids:
+                prefix = relpath and relpath + os.sep
+                stack.extend((kids[name], prefix + name)
+                             for name in sorted(kids, reverse=True))
+
+    def dump(self):
+        """Returns a picklable snapshot of the store"""
+        # files can change while nobody watches, so binary marks aren't kept
+        flags = self.flags.tostring().translate(_DROP_BINARY)
+        return (self.root, self.names, self.parents.tostring(),
+                self.mtimes.tostring(), flags,
+                self.doctypes.tostring(), self.doctype_names)
+
+    def load(self, data):
+        """Restores a snapshot created by :meth:`dump`"""
+        self.clear()
+        (root, names, parents, mtimes, flags,
+         doctypes, self.doctype_names) = data
+        self.names = [isinstance(name, str) and intern(name) or name
+                      for name in names]
+        self.parents.fromstring(parents)
+        self.mtimes.fromstring(mtimes)
+        self.flags.fromstring(flags)
+        self.doctypes.fromstring(doctypes)
+        self._doctype_ids = dict((doctype, i) for i, doctype in
+                                 enumerate(self.doctype_names))
+        self.root = root
+
+        children = self.children
+        by_name = self.by_name
+        for id_, flag in enumerate(self.flags):
+            if not flag:
+                self._free.append(id_)
+            elif flag & FLAG_DIR:
+                children[id_] = {}
+        for id_, parent in enumerate(self.parents):
+            if not self.flags[id_]:
+                continue
+            name = self.names[id_]
+            if parent >= 0:
+                children[parent][name] = id_
+            by_name.setdefault(name, []).append(id_)
+        for observer in self.observers:
+            observer.store_reset()
+
+
+class FileInfo(object):
+    """
+    Lightweight view of one entry of a :class:`FileStore`
+
+    Views are created on demand and only valid as long as their entry
+    is not removed from the index.
+    """
+    __slots__ = 'store', 'id', '_relpath'
+
+    def __init__(self, store, id_, relpath=None):
+        self.store = store
+        self.id = id_
+        self._relpath = relpath
+
+    @property
+    def relpath(self):
+        if self._relpath is None:
+            self._relpath = self.store.relpath(self.id)
+        return self._relpath
+
+    @property
+    def basename(self):
+        return self.store.names[self.id]
+
+    @property
+    def dirname(self):
+        return os.path.dirname(self.relpath)
+
+    @property
+    def ext(self):
+        return os.path.splitext(self.basename)[1]
+
+    @property
+    def doctype(self):
+        return self.store.doctype_names[self.store.doctypes[self.id]]
+
+    @property
+    def is_dir(self):
+        return bool(self.store.flags[self.id] & FLAG_DIR)
+
+    @property
+    def is_file(self):
+        return bool(self.store.flags[self.id] & FLAG_FILE)
+
+    @property
+    def mtime(self):
+        return self.store.mtimes[self.id]
+
+    @property
+    def children(self):
+        prefix = self.relpath and self.relpath + os.sep
+        return dict((name, FileInfo(self.store, id_, prefix + name))
+                    for name, id_ in
+                    self.store.children.get(self.id, {}).iteritems())
+
+    def __eq__(self, other):
+        return isinstance(other, FileInfo) and \
+               self.store is other.store and self.id == other.id
+
+    def __ne__(self, other):
+        return not self == other
+
+    def __hash__(self):
+        return hash(self.id)
 
     def __repr__(self):
         return "<FileInfo %s >" % self.relpath
 
 
+class PathMap(Mapping):
+    """Read only mapping of relative paths to :class:`FileInfo` views"""
+
+    def __init__(self, store, mask=FLAG_USED):
+        self.store = store
+        self.mask = mask
+
+    def __getitem__(self, relpath):
+        id_ = self.store.lookup(relpath)
+        if id_ is None or not self.store.flags[id_] & self.mask:
+            raise KeyError(relpath)
+        return FileInfo(self.store, id_, relpath)
+
+    def __iter__(self):
+        flags = self.store.flags
+        for id_, relpath in self.store.walk():
+            if flags[id_] & self.mask:
+                yield relpath
+
+    def __len__(self):
+        mask = self.mask
+        return sum(1 for flag in self.store.flags if flag & mask)
+
+
+class NameMap(Mapping):
+    """
+    Read only mapping of basenames to lists of :class:`FileInfo` views
+
+    Like a defaultdict unknown names map to an empty list.
+    """
+
+    def __init__(self, store, mask=FLAG_USED):
+        self.store = store
+        self.mask = mask
+
+    def __getitem__(self, name):
+        flags = self.store.flags
+        return [FileInfo(self.store, id_)
+                for id_ in self.store.by_name.get(name, ())
+                if flags[id_] & self.mask]
+
+    def __contains__(self, name):
+        flags = self.store.flags
+        return any(flags[id_] & self.mask
+                   for id_ in self.store.by_name.get(name, ()))
+
+    def __iter__(self):
+        for name in self.store.by_name.keys():
+            if name in self:
+                yield name
+
+    def __len__(self):
+        return sum(1 for name in self)
+
+
 class Indexer(Log):
     def __init__(self, project):
         self.project = project
-        self.reset_cache()
-
-    def reset_cache(self):
+        self.store = FileStore()
         self.cache = {
-                "paths": {},
-                "dirs": {},
-                "files": {},
-                "filenames": defaultdict(list),
-                "dirnames": defaultdict(list),
+                "paths": PathMap(self.store),
+                "dirs": PathMap(self.store, FLAG_DIR),
+                "files": PathMap(self.store, FLAG_FILE),
+                "filenames": NameMap(self.store, FLAG_FILE),
+                "dirnames": NameMap(self.store, FLAG_DIR),
                }
 
+    def reset_cache(self):
+        self.store.clear()
+
+    @cached_property
+    def finder(self):
+        """
+        The :class:`~pida.core.filefinder.FileFinder` of this index
+        """
+        from pida.core.filefinder import FileFinder
+        return FileFinder(self.store)
+
     def save_cache(self):
+        """
+        Save a snapshot of the index.
+
+        The columns of the store are written as they are, so loading only
+        has to rebuild the lookup tables and stat the directories.
+        """
         path = self.project.get_meta_dir(filename=CACHE_NAME)
         try:
-            with open(path, "w") as fp:
-                pickle.dump(self.cache, fp)
-        except OSError, err:
+            with open(path, "wb") as fp:
+                pickle.dump((CACHE_VERSION, self.store.dump()), fp,
+                            pickle.HIGHEST_PROTOCOL)
+        except (IOError, OSError), err:
             self.log.error("can't save cache: {err}", err=err)
 
     def load_cache(self):
+        """
+        Load the snapshot written by :meth:`save_cache`.
+
+        Directories whose mtime differs from the snapshot are rescanned,
+        everything else is taken as is.
+        """
         path = self.project.get_meta_dir(filename=CACHE_NAME)
-        if os.path.isfile(path):
+        if not os.path.isfile(path):
+            return False
+        try:
+            with open(path, "rb") as fp:
+                version, data = pickle.load(fp)
+            if version != CACHE_VERSION:
+                raise ValueError("unknown cache version %r" % version)
+            self.store.load(data)
+        except Exception, err:
+            self.log.error("can't load cache of {indexer!r}", indexer=self)
+            self.store.clear()
+            os.unlink(path)
+            return False
+
+        store = self.store
+        root = self.project.source_directory
+        stale = []
+        gone = []
+        # collect first, walking the store while changing it is not safe
+        for id_, relpath in store.walk():
+            if not store.flags[id_] & FLAG_DIR:
+                continue
             try:
-                with open(path) as fp:
-                    self.cache = pickle.load(fp)
-                return True
-            except Exception, err:
-                self.log.error("can't load cache of {indexer!r}", indexer=self)
-                os.unlink(path)
-        return False
-
-
-    def rebuild_shortcuts(self):
-        self.cache["dirs"] = {}
-        self.cache["files"] = {}
-        self.cache["filenames"] = defaultdict(list)
-        self.cache["dirnames"] = defaultdict(list)
-
-        for info in self.cache["paths"].itervalues():
-            if info.is_dir:
-                self.cache["dirs"][info.relpath] = info
-                self.cache["dirnames"][info.basename].append(info)
-            elif info.is_file:
-                self.cache["files"][info.relpath] = info
-                self.cache["filenames"][info.basename].append(info)
-
-    def index_path(self, path, update_shortcuts=False):
+                st = os.stat(os.path.join(root, relpath))
+            except OSError:
+                gone.append(relpath)
+                continue
+            if not stat.S_ISDIR(st.st_mode):
+                gone.append(relpath)
+            elif st.st_mtime != store.mtimes[id_]:
+                stale.append(relpath)
+
+        for relpath in gone:
+            id_ = store.lookup(relpath)
+            if id_ is not None:
+                store.remove(id_)
+        for relpath in stale:
+            if store.lookup(relpath) is not None:
+                self._rescan_dir(relpath)
+        return True
+
+    def _doctype_for(self, path):
+        from pida.services.language import DOCTYPES
+        doctype = DOCTYPES.type_by_filename(path)
+        return doctype and doctype.internal or None
+
+    def get_info(self, relpath):
+        """Returns a :class:`FileInfo` for relpath or None"""
+        id_ = self.store.lookup(relpath)
+        if id_ is not None:
+            return FileInfo(self.store, id_, relpath)
+
+    def index_path(self, path, st=None):
         """
         Update the index of a single file/directory
 
         @path is an absolute path
+        @st is an optional `os.stat` result of path
         """
-        from pida.services.language import DOCTYPES
-        doctype = DOCTYPES.type_by_filename(path)
         rel = self.project.get_relative_path_for(path)
         if rel is None:
-            return
-        rpath = os.sep.join(self.project.get_relative_path_for(path))
-
-        if rpath is None:
             #document outside of project
             return
-        if rpath in self.cache['paths']:
-            info = self.cache['paths'][rpath]
-        else:
+        rpath = os.sep.join(rel)
+        if st is None:
             try:
-                info = FileInfo(path, rpath)
+                st = os.stat(path)
             except OSError, err:
-                self.log.info(_("Error indexing {path}:{err}"), path=path, err=err)
+                self.log.info(_("Error indexing {path}:{err}"),
+                              path=path, err=err)
+                return
+
+        store = self.store
+        flags = flags_for_stat(st)
+        id_ = store.lookup(rpath)
+        if id_ is not None and \
+           (store.flags[id_] & FLAG_DIR) != (flags & FLAG_DIR):
+            # a file got replaced by a directory or the other way round
+            store.remove(id_)
+            id_ = None
+
+        if id_ is not None:
+            store.set_stat(id_, flags, st.st_mtime)
+            return FileInfo(store, id_, rpath)
+
+        doctype = None
+        if not flags & FLAG_DIR:
+            doctype = self._doctype_for(path)
+        if not rpath:
+            id_ = store.add(None, '', flags, st.st_mtime)
+            return FileInfo(store, id_, rpath)
+
+        parent = store.lookup(os.path.dirname(rpath))
+        if parent is None:
+            parent_info = self.index_path(os.path.dirname(path))
+            self.log.info(_('Project refresh highly suggested'))
+            if parent_info is None or not parent_info.is_dir:
                 return
-        info.doctype = doctype and doctype.internal or None
-        self.cache["paths"][info.relpath] = info
-
-        if update_shortcuts:
-            if info.is_dir:
-                if info not in self.cache["dirnames"][info.basename]:
-                    self.cache["dirnames"][info.basename].append(info)
-                self.cache["dirs"][info.relpath] = info
-            if info.is_file:
-                if info not in self.cache["filenames"][info.basename]:
-                    self.cache["filenames"][info.basename].append(info)
-                self.cache["files"][info.relpath] = info
-
-        if info.dirname != info.basename:
-            if not info.dirname in self.cache["paths"]:
-                self.index(info.dirname, recrusive=False)
-                self.log.info(_('Project refresh highly suggested'))
-            self.cache["paths"][info.dirname].children[info.basename] = info
-
-        return info
-
-    def _del_info(self, info):
-        """Delete info and all children if any recrusivly"""
-        #raise Exception()
-        if info.dirname:
-            parent = self.cache['paths'][info.dirname]
-            if info in parent.children:
-                del parent.children[info.basename]
-
-        if info.is_dir:
-            match = "%s%s" % (info.relpath, os.path.sep)
-            todel = []
-            for key in self.cache['paths'].iterkeys():
-                if key[:len(match)] == match:
-                    todel.append(key)
-            for key in todel:
-                del self.cache['paths'][key]
-
-        del self.cache['paths'][info.relpath]
+            parent = parent_info.id
+        id_ = store.add(parent, os.path.basename(rpath), flags,
+                        st.st_mtime, doctype)
+        return FileInfo(store, id_, rpath)
+
+    def remove_path(self, path):
+        """
+        Remove a file/directory and everything below it from the index
+
+        @path is an absolute path
+        """
+        rel = self.project.get_relative_path_for(path)
+        if rel is None:
+            return
+        id_ = self.store.lookup(os.sep.join(rel))
+        if id_ is not None:
+            self.store.remove(id_)
+
+    def process_changes(self, changed=(), removed=()):
+        """
+        Apply filesystem changes, as reported by the filewatcher.
+
+        Only the given paths are touched, new directories are indexed
+        recursively.
+
+        @changed: absolute paths that were created or modified
+        @removed: absolute paths that were deleted
+        """
+        for path in removed:
+            self.remove_path(path)
+        for path in changed:
+            rel = self.project.get_relative_path_for(path)
+            if rel is None:
+                continue
+            is_new = self.store.lookup(os.sep.join(rel)) is None
+            info = self.index_path(path)
+            if info is None:
+                # vanished again before we got to it
+                self.remove_path(path)
+            elif info.is_dir and is_new:
+                self.index(path, recrusive=True)
+
+    def iter_files(self, path, recursive=True, hidden=False):
+        """
+        Iterate the absolute paths of the indexed files below `path`,
+        skipping files known to be binary.
 
+        Returns None if `path` is not in the index.
+
+        @path: absolute path of a directory
+        @hidden: include files and directories starting with a dot
+        """
+        path = os.path.normpath(path)
+        rel = self.project.get_relative_path_for(path)
+        if rel is None:
+            return None
+        id_ = self.store.lookup(os.sep.join(rel))
+        if id_ is None or not self.store.flags[id_] & FLAG_DIR:
+            return None
+        return self._iter_files(id_, path, recursive, hidden)
+
+    def _iter_files(self, id_, path, recursive, hidden):
+        store = self.store
+        stack = [(id_, path)]
+        while stack:
+            id_, path = stack.pop()
+            # snapshot, the index may change while we are iterating
+            for name, child in sorted(store.children.get(id_, {}).items()):
+                if name[0] == '.' and not hidden:
+                    continue
+                flags = store.flags[child]
+                if flags & FLAG_DIR:
+                    if recursive:
+                        stack.append((child, os.path.join(path, name)))
+                elif flags & FLAG_FILE and not flags & FLAG_BINARY:
+                    yield os.path.join(path, name)
+
+    def mark_binary(self, path):
+        """
+        Remember that the file at the absolute `path` is binary until it
+        changes again
+        """
+        rel = self.project.get_relative_path_for(path)
+        if rel is None:
+            return
+        id_ = self.store.lookup(os.sep.join(rel))
+        if id_ is not None:
+            self.store.flags[id_] |= FLAG_BINARY
+
+    def _rescan_dir(self, relpath):
+        """
+        Rescan a directory that changed since the snapshot was taken.
+
+        Subdirectories that show up are new and get indexed recursively.
+        """
+        before = set(self.store.children.get(self.store.lookup(relpath), ()))
+        info = self.index(relpath, recrusive=False)
+        if info is None or not info.is_dir:
+            return
+        for name, child in info.children.iteritems():
+            if child.is_dir and name not in before:
+                self.index(child.relpath, recrusive=True)
 
     def index(self, path="", recrusive=False, rebuild=False):
         """
@@ -164,51 +627,41 @@ class Indexer(Log):
             self.reset_cache()
 
         if os.path.isabs(path):
-            rpath = self.project.get_relative_path_for(path)
+            rpath = os.path.normpath(path)
         else:
-            rpath = os.path.join(self.project.source_directory, path)
-
-        if os.path.isfile(rpath):
-            return self.index_path(rpath)
+            rpath = os.path.normpath(
+                os.path.join(self.project.source_directory, path))
 
         #creat the root node
-        self.index_path(rpath, update_shortcuts=False)
+        root = self.index_path(rpath)
+        if root is None or not root.is_dir:
+            return root
 
+        store = self.store
         for dirpath, dirs, files in os.walk(rpath):
-            current = self.cache['paths'][
-                             os.sep.join(self.project.get_relative_path_for(dirpath))]
-            if not recrusive:
+            current = store.lookup(
+                        os.sep.join(self.project.get_relative_path_for(dirpath)))
+            if current is None:
                 del dirs[:]
+                continue
             for file_ in files:
                 if os.access(os.path.join(dirpath, file_), os.R_OK):
-                    self.index_path(os.path.join(dirpath, file_),
-                                    update_shortcuts=False)
+                    self.index_path(os.path.join(dirpath, file_))
             for dir_ in dirs:
                 if os.access(os.path.join(dirpath, dir_), os.R_OK | os.X_OK):
-                    self.index_path(os.path.join(dirpath, dir_),
-                                    update_shortcuts=False)
+                    self.index_path(os.path.join(dirpath, dir_))
 
             # delete not existing nodes
-            #print current.children, files+dirs
-            for old in [x for x in current.children if x not in files + dirs]:
-                self._del_info(current.children[old])
-            #match = "%s%s" %(current.relpath, os.path.sep)
-            #for key, item in self._cache['paths'].iteritems():
-            #    print key, match, key[:len(match)]
-            #    if key[:len(match)] == match:
-            #      if item.basename not in dirs and item.basename not in files:
-                        #print "dell", key
-                        #del self._cache[key]
-        try:
-            self.rebuild_shortcuts()
-        except RuntimeError:
-            # this happens when a index process is running while a file
-            # is saved in the project of a non indexed directory which will
-            # index the directory and a dictionary changed size during iteration
-            # will most likely raise. they are harmless
-            pass
+            existing = set(files)
+            existing.update(dirs)
+            kids = store.children.get(current, {})
+            for old in [x for x in kids if x not in existing]:
+                store.remove(kids[old])
 
+            if not recrusive:
+                del dirs[:]
 
+        return root
 
     def query(self, test):
         """
@@ -216,15 +669,17 @@ class Indexer(Log):
         This is the most powerfull but slowest test.
 
         :param test:
-            callable which gets a FileInfo object passed 
+            callable which gets a FileInfo object passed
             and returns a :class:`Result` object
         """
-        paths = sorted(self.cache['paths'])
-        skip = None
-        for path in paths:
-            if skip and path[:len(skip)] == skip:
-                continue
-            item = self.cache['paths'][path]
+        store = self.store
+        if store.root is None:
+            return
+        stack = [(store.root, '')]
+        children = store.children
+        while stack:
+            id_, path = stack.pop()
+            item = FileInfo(store, id_, path)
             res = test(item)
             if res is None:
                 # asume not accepted, but recurse on no result
@@ -232,12 +687,15 @@ class Indexer(Log):
             if res.accept:
                 yield item
 
-            if not res.recurse:
-                skip = "%s%s" % (path, os.path.sep)
-
             if res.abort:
                 break
 
+            kids = children.get(id_)
+            if res.recurse and kids:
+                prefix = path and path + os.sep
+                stack.extend((kids[name], prefix + name)
+                             for name in sorted(kids, reverse=True))
+
     def query_basename(self, filename, glob=False, files=True, dirs=False,
                        case=False):
         """
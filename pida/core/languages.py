@@ -9,8 +9,13 @@ Language Support Superclasses
 from functools import partial
 from weakref import WeakKeyDictionary
 import abc
+import heapq
+import itertools
 import string
+import threading
+import time
 import gobject
+from pygtkhelpers.gthreads import GeneratorTask
 
 from pida.core.document import Document
 
@@ -542,20 +547,63 @@ def safe_remote(func):
     return safe
 
 
+class JobWorker(object):
+    """
+    One external process of a :class:`JobServer` and its bookkeeping
+    """
+
+    def __init__(self, manager):
+        self.manager = manager
+        # document unique_id -> {plugin type: instance}
+        self.instances = {}
+        self.pending = 0
+        self.jobs = 0
+        self.busy_time = 0.0
+        self.restarts = 0
+
+    @property
+    def alive(self):
+        process = getattr(self.manager, '_process', None)
+        return process is not None and process.is_alive()
+
+    @property
+    def pid(self):
+        process = getattr(self.manager, '_process', None)
+        return process and process.pid
+
+    @property
+    def latency(self):
+        """Average seconds a job took"""
+        if not self.jobs:
+            return 0.0
+        return self.busy_time / self.jobs
+
+
 class JobServer(Log):
     """
     The Jobserver dispatches language plugin jobs to external processes it
     manages.
+
+    A document sticks to the process that ran its first job, so the caches
+    of the plugins in there stay warm. New documents go to a new process
+    until `max_processes` run and then to the one with the fewest pending
+    jobs and documents. A process that died is started again on its next
+    job.
     """
     def __init__(self, svc, external, max_processes=2):
         self.svc = svc
         self.max_processes = max_processes
         self.stopped = False
-        # we have to map the proxy objects to
         self._external = external
-        self._processes = []
-        self._proxy_map = WeakKeyDictionary()
-        self._instances = {}
+        self._workers = []
+        # document -> JobWorker
+        self._affinity = WeakKeyDictionary()
+        self._lock = threading.RLock()
+
+    def _start_manager(self):
+        manager = self._external()
+        manager.start()
+        return manager
 
     def get_process(self, proxy=None):
         """
@@ -563,13 +611,59 @@ class JobServer(Log):
         It tries to use the same instance for proxy so it does not need to
         be recreated and can make best use of caching
         """
-        #FIXME needs some better management of processes and dispatching
-        if not self._processes:
-            np = self._external()
-            np.start()
-            self._instances[np] = {} #np.dict()
-            self._processes.append(np)
-        return self._processes[0]
+        return self.get_worker(proxy).manager
+
+    def get_worker(self, proxy=None):
+        """
+        Returns the :class:`JobWorker` that runs the jobs of the document
+        of proxy
+        """
+        document = getattr(proxy, 'document', None)
+        with self._lock:
+            worker = None
+            if document is not None:
+                worker = self._affinity.get(document)
+            if worker is None:
+                worker = self._least_loaded()
+                if document is not None:
+                    self._affinity[document] = worker
+            if not worker.alive:
+                self._replace(worker)
+            return worker
+
+    def _least_loaded(self):
+        if len(self._workers) < self.max_processes:
+            worker = JobWorker(self._start_manager())
+            self._workers.append(worker)
+            return worker
+        documents = self._document_counts()
+        return min(self._workers,
+                   key=lambda w: (w.pending, documents.get(w, 0)))
+
+    def _document_counts(self):
+        counts = {}
+        for worker in self._affinity.values():
+            counts[worker] = counts.get(worker, 0) + 1
+        return counts
+
+    def _replace(self, worker):
+        """Start a new process for a dead worker"""
+        with self._lock:
+            if worker.alive:
+                # some other job was faster
+                return
+            self.log.warning(_("external process {pid} died, restarting"),
+                             pid=worker.pid)
+            try:
+                worker.manager.is_shutdown = True
+                worker.manager.shutdown()
+            except Exception:
+                pass
+            # forking the new process would try to reach the dead one for
+            # every proxy that is still alive
+            worker.instances = {}
+            worker.manager = self._start_manager()
+            worker.restarts += 1
 
     def get_instance(self, proxy):
         """
@@ -578,38 +672,220 @@ class JobServer(Log):
 
         Everything called on this objects are done in the external process
         """
-        manager = self._proxy_map.get(proxy, None)
-        if not manager:
-            manager = self.get_process(proxy)
-            self._proxy_map[proxy] = manager
-        instances = self._instances[manager]
-        if id(proxy.document) not in instances:
-            instances[id(proxy.document)] = manager.dict()
-        if proxy.mytype not in instances[id(proxy.document)]:
-            #no = getattr(manager, type_)(manager)(None, proxy.document)
-            instances[id(proxy.document)][proxy.mytype] = getattr(manager, proxy.mytype)(None, proxy.get_external_document())
-        return manager, instances[id(proxy.document)][proxy.mytype]
+        worker, instance = self._get_instance(proxy)
+        return worker.manager, instance
+
+    def _get_instance(self, proxy):
+        worker = self.get_worker(proxy)
+        with self._lock:
+            manager = worker.manager
+            instances = worker.instances.setdefault(id(proxy.document), {})
+            if proxy.mytype not in instances:
+                instances[proxy.mytype] = getattr(manager, proxy.mytype)(
+                    None, proxy.get_external_document())
+            return worker, instances[proxy.mytype]
 
     @safe_remote
     def run(self, proxy, *k, **kw):
         """Forwards to the external process"""
-        manager, instance = self.get_instance(proxy)
-        return manager.run(instance, *k, **kw)
-
+        worker, instance = self._get_instance(proxy)
+        manager = worker.manager
+        with self._lock:
+            worker.pending += 1
+        start = time.time()
+        try:
+            for result in manager.run(instance, *k, **kw):
+                yield result
+        except (EOFError, IOError):
+            if self.stopped or worker.alive:
+                raise
+            # the next job of one of its documents starts it again
+            self.log.warning(_("external process {pid} crashed"),
+                             pid=worker.pid)
+        finally:
+            with self._lock:
+                worker.pending -= 1
+                worker.jobs += 1
+                worker.busy_time += time.time() - start
+
+    def stats(self):
+        """
+        Returns a dict of numbers for each external process: its pid, the
+        number of documents routed to it, pending and finished jobs, their
+        average latency in seconds and how often it had to be restarted
+        """
+        with self._lock:
+            documents = self._document_counts()
+            return [dict(pid=worker.pid,
+                         documents=documents.get(worker, 0),
+                         pending=worker.pending,
+                         jobs=worker.jobs,
+                         latency=worker.latency,
+                         restarts=worker.restarts)
+                    for worker in self._workers]
 
     def stop(self):
         self.stopped = True
-        for i in self._processes:
-            i.is_shutdown = True
-            i.shutdown()
+        for worker in self._workers:
+            worker.manager.is_shutdown = True
+            worker.manager.shutdown()
 
     def restart(self):
         self.log.info(_("restart jobserver"))
         self.stop()
         self.stopped = False
-        self._processes = []
-        self._proxy_map = WeakKeyDictionary()
-        self._instances = {}
+        self._workers = []
+        self._affinity = WeakKeyDictionary()
+
+
+class LanguageJob(object):
+    """
+    A run of a language plugin for a document, see :class:`JobScheduler`
+    """
+
+    def __init__(self, document, feature, work, loop_callback,
+                 complete_callback=None, priority=PRIO_DEFAULT):
+        self.document = document
+        self.feature = feature
+        self.work = work
+        self.loop_callback = loop_callback
+        self.complete_callback = complete_callback
+        self.priority = priority
+        self.cancelled = False
+        self.task = None
+
+    @property
+    def key(self):
+        return self.document.unique_id, self.feature
+
+    def start(self, finished):
+        self.task = GeneratorTask(self.work, self._loop,
+                                  partial(finished, self),
+                                  priority=self.priority)
+        self.task.start()
+
+    def _loop(self, *args):
+        # items already on their way to the main loop
+        if not self.cancelled:
+            self.loop_callback(*args)
+
+    def cancel(self):
+        """
+        Stop the job, a running plugin stops at its next item and drops its
+        generator in the external process
+        """
+        self.cancelled = True
+        if self.task is not None:
+            self.task.stop()
+
+    def set_priority(self, priority):
+        self.priority = priority
+        if self.task is not None:
+            self.task.priority = priority
+
+
+class JobScheduler(object):
+    """
+    Runs language plugin jobs, at most `max_running` at once.
+
+    There is only one job per (document, feature): scheduling a job
+    replaces a pending one and cancels a running one of the same key.
+    Jobs of the focused document run with PRIO_FOREGROUND before the
+    others, the jobs of a document that lost the focus are dropped as
+    nobody waits for their results.
+
+    All methods are to be called from the main loop.
+    """
+
+    def __init__(self, max_running=2):
+        self.max_running = max_running
+        self.focused = None
+        # key -> pending or running job
+        self._jobs = {}
+        # (priority, sequence, job)
+        self._queue = []
+        self._running = set()
+        self._sequence = itertools.count()
+
+    def schedule(self, document, feature, work, loop_callback,
+                 complete_callback=None, priority=None):
+        """
+        Schedule a job calling `loop_callback` with every item of `work()`
+        and `complete_callback` when it is done.
+
+        Without a priority the focused document gets PRIO_FOREGROUND and
+        all others PRIO_DEFAULT.
+        """
+        if priority is None:
+            if document is self.focused:
+                priority = PRIO_FOREGROUND
+            else:
+                priority = PRIO_DEFAULT
+        job = LanguageJob(document, feature, work, loop_callback,
+                          complete_callback, priority)
+        old = self._jobs.get(job.key)
+        if old is not None:
+            self._drop(old)
+        self._jobs[job.key] = job
+        heapq.heappush(self._queue, (priority, self._sequence.next(), job))
+        self._start_jobs()
+        return job
+
+    def focus(self, document):
+        """
+        Make document the focused one, dropping the jobs of all others
+        """
+        self.focused = document
+        for job in self._jobs.values():
+            if job.document is document:
+                job.set_priority(min(job.priority, PRIO_FOREGROUND))
+            else:
+                self._drop(job)
+        self._start_jobs()
+
+    def cancel(self, document, feature=None):
+        """Drop the jobs of a document, or only the one of feature"""
+        for job in self._jobs.values():
+            if job.document is document and feature in (None, job.feature):
+                self._drop(job)
+        self._start_jobs()
+
+    def stop(self):
+        for job in self._jobs.values():
+            self._drop(job)
+
+    @property
+    def pending(self):
+        return len(self._jobs) - len(self._running)
+
+    @property
+    def running(self):
+        return len(self._running)
+
+    def _drop(self, job):
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+        job.cancel()
+        # a stopped task never completes, so its slot is free right now
+        self._running.discard(job)
+
+    def _start_jobs(self):
+        while self._queue and len(self._running) < self.max_running:
+            priority, sequence, job = heapq.heappop(self._queue)
+            if job.cancelled:
+                continue
+            self._running.add(job)
+            job.start(self._finished)
+
+    def _finished(self, job):
+        if job not in self._running:
+            return
+        self._running.discard(job)
+        if self._jobs.get(job.key) is job:
+            del self._jobs[job.key]
+        if job.complete_callback is not None:
+            job.complete_callback()
+        self._start_jobs()
 
 
 class LanguageService(Service):
@@ -29,7 +29,8 @@ from pida.core.actions import TYPE_NORMAL, TYPE_MENUTOOL, TYPE_DROPDOWNMENUTOOL,
 from pida.core.options import OptionsConfig
 from pida.core.environment import on_windows
 
-from pygtkhelpers.gthreads import GeneratorTask, AsyncTask, gcall
+from pygtkhelpers.gthreads import AsyncTask, gcall
+from pida.utils.gthreads import BatchedGeneratorTask
 from pida.utils.path import homedir
 
 from pida.ui.views import PidaView, WindowConfig
@@ -249,7 +250,30 @@ class FilemanagerView(PidaView):
 
         self.show_or_hide(entry, select=select)
 
-    def show_or_hide(self, entry, select=False):
+    def add_or_update_files(self, items, select=None):
+        """
+        Add or update many (name, basepath, state) items at once, new
+        entries are put into the list in one go.
+        """
+        new = []
+        for name, basepath, state in items:
+            if basepath != self.path:
+                continue
+            entry = self.entries.get(name)
+            if entry is not None:
+                entry.state = state
+                self.show_or_hide(entry, select=(name == select))
+                continue
+            entry = self.entries[name] = FileEntry(name, basepath, self)
+            entry.state = state
+            entry.visible = self.is_visible(entry)
+            new.append(entry)
+        self.file_list.extend(new)
+        entry = self.entries.get(select)
+        if entry in new and entry.visible:
+            self.file_list.selected_item = entry
+
+    def is_visible(self, entry):
         def check(checker):
             if (checker.identifier in self._file_hidden_check_actions) and \
                (self._file_hidden_check_actions[checker.identifier].get_active()):
@@ -259,11 +283,11 @@ class FilemanagerView(PidaView):
                 return True
 
         if self.svc.opt('show_hidden') or entry.parent_link:
-            show = True
-        else:
-            show = all(check(x)
-                        for x in self.svc.features['file_hidden_check'])
+            return True
+        return all(check(x) for x in self.svc.features['file_hidden_check'])
 
+    def show_or_hide(self, entry, select=False):
+        show = self.is_visible(entry)
         entry.visible = show
         if entry not in self.file_list:
             self.file_list.append(entry)
@@ -308,11 +332,11 @@ class FilemanagerView(PidaView):
                     state = 'unknown'
                 yield filename, basepath, state
 
-        # wrap add_or_update_file to set select accordingly
-        def _add_or_update_file(name, basepath, state):
-            self.add_or_update_file(name, basepath, state, select=(name==select))
+        # wrap add_or_update_files to set select accordingly
+        def _add_or_update_files(items):
+            self.add_or_update_files(items, select=select)
 
-        GeneratorTask(work, _add_or_update_file).start(self.path)
+        BatchedGeneratorTask(work, _add_or_update_files).start(self.path)
 
         self.create_ancest_tree()
 
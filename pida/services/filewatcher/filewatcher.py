@@ -26,6 +26,9 @@ import gio
 
 class FilewatcherEvents(EventsConfig):
 
+    def create(self):
+        self.publish('files_changed')
+
     def subscribe_all_foreign(self):
         self.subscribe_foreign('filemanager', 'browsed_path_changed',
                                self.svc.on_browsed_path_changed)
@@ -58,7 +61,7 @@ class FileWatcher(Service):
 
     def callcmd(self, cmd, name):
 
-        self.boss.cmd('filemanager', command,
+        self.boss.cmd('filemanager', cmd,
                 filename=os.path.basename(name),
                 dirname=self.dir)
 
@@ -82,10 +85,12 @@ class FileWatcher(Service):
         # ['FILE_MONITOR_EVENT_ATTRIBUTE_CHANGED', 'FILE_MONITOR_EVENT_CHANGED', 'FILE_MONITOR_EVENT_CHANGES_DONE_HINT', 'FILE_MONITOR_EVENT_CREATED', 'FILE_MONITOR_EVENT_DELETED', 'FILE_MONITOR_EVENT_PRE_UNMOUNT', 'FILE_MONITOR_EVENT_UNMOUNTED', 'FILE_MONITOR_NONE', 'FILE_MONITOR_WATCH_MOUNTS']
         #XXX: store events, act on hints
         if event in (gio.FILE_MONITOR_EVENT_DELETED,):
+            self.emit('files_changed', changed=(), removed=(file.get_path(),))
             self.callcmd('update_removed_file', file.get_path())
         elif event in (gio.FILE_MONITOR_EVENT_CHANGED,
                        gio.FILE_MONITOR_EVENT_CREATED,
                        gio.FILE_MONITOR_EVENT_ATTRIBUTE_CHANGED):
+            self.emit('files_changed', changed=(file.get_path(),), removed=())
             self.callcmd('update_file', file.get_path())
 
         
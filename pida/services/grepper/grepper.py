@@ -17,7 +17,9 @@ from pida.core.events import EventsConfig
 from pida.core.options import OptionsConfig
 from pida.core.features import FeaturesConfig
 from pida.core.actions import ActionsConfig
-from pygtkhelpers.gthreads import GeneratorTask
+from pygtkhelpers.gthreads import gcall
+from pida.utils.gthreads import BatchedGeneratorTask
+from .search import GrepEngine
 
 # locale
 from pida.core.locale import Locale
@@ -166,8 +168,10 @@ class GrepperView(PidaView):
         self.pattern_entry = self.pattern_combo.child
         self.pattern_entry.connect('activate', self._on_pattern_entry_activate)
 
-        self.task = GeneratorTask(self.svc.grep, self.append_to_matches_list,
-                                  self.grep_complete, pass_generator=True)
+        self.task = BatchedGeneratorTask(self.svc.grep,
+                                         self.append_to_matches_list,
+                                         self.grep_complete,
+                                         pass_generator=True)
         self.running = False
 
     def on_matches_list__item_activated(self, ol, item):
@@ -175,10 +179,12 @@ class GrepperView(PidaView):
                                                  line=item.linenumber)
         self.svc.boss.editor.cmd('grab_focus')
 
-    def append_to_matches_list(self, grepper_item):
+    def append_to_matches_list(self, grepper_items):
         # select the first item (slight hack)
         select = not len(self.matches_list)
-        self.matches_list.append(grepper_item, select=select)
+        self.matches_list.extend(grepper_items)
+        if select and len(self.matches_list):
+            self.matches_list.selected_item = self.matches_list[0]
 
     def on_find_button__clicked(self, button):
         if self.running:
@@ -327,7 +333,9 @@ class Grepper(Service):
 
     def pre_start(self):
         self.current_project_source_directory = None
+        self.current_project = None
         self._views = []
+        self.engine = GrepEngine()
 
     def show_grepper_in_project_source_directory(self):
         if self.current_project_source_directory is None:
@@ -354,83 +362,66 @@ class Grepper(Service):
     def grep(self, top, regex, recursive=False, show_hidden=False,
              generator_task=None):
         """
-        grep is a wrapper around _grep_file_list and _grep_file.
+        Grep the files below `top`, yielding a GrepperItem for every
+        matching line.
+
+        The file list comes from the index of the current project if it
+        covers `top`, files are searched by the worker processes of
+        :class:`~pida.services.grepper.search.GrepEngine`.
         """
         self._result_count = 0
         if os.path.isfile(top):
-            file_results = self._grep_file(top, regex)
-            for result in file_results:
-                yield result
-        elif recursive:
-            for root, dirs, files in os.walk(top):
-                if generator_task.is_stopped:
-                    return
-                # Remove hidden directories
-                if os.path.basename(root).startswith('.') and not show_hidden:
-                    del dirs[:]
-                    continue
-                for matches in self._grep_file_list(files, root, regex,
-                                                generator_task=generator_task,
-                                                show_hidden=show_hidden):
-                    yield matches
+            filenames = [top]
         else:
-            for matches in self._grep_file_list(os.listdir(top), top, regex,
-                                                generator_task=generator_task,
-                                                show_hidden=show_hidden):
-                yield matches
-
-    def _grep_file_list(self, file_list, root, regex, show_hidden=False,
-                                               generator_task=None):
-        """
-        Grep for a list of files.
-
-        takes as it's arguments a list of files to grep, the directory
-        containing that list, and a regular expression to search for in them
-        (optionaly whether or not to search hidden files).
-
-        _grep_file_list itterates over that file list, and calls _grep_file on
-        each of them with the supplied arguments.
-        """
-        for file in file_list:
-            if generator_task and generator_task.is_stopped:
-                return
+            filenames = self._files_to_grep(top, recursive, show_hidden)
+        is_stopped = None
+        if generator_task is not None:
+            is_stopped = lambda: generator_task.is_stopped
+        indexer = self._indexer
+        for filename, results in self.engine.search(filenames, regex,
+                                                    is_stopped):
+            if results is None:
+                if indexer is not None:
+                    gcall(indexer.mark_binary, filename)
+                continue
+            if not results:
+                continue
+            for linenumber, line, matches in results:
+                yield GrepperItem(filename, self, linenumber, line, matches)
+            self._result_count += len(results)
             if self._result_count > self.opt('maximum_results'):
                 break
-            if file.startswith(".") and not show_hidden:
-                continue
-            # never do this, always use os.path.join
-            # filename = "%s/%s" % (root, file,)
-            filename = os.path.join(root, file)
-            file_results = self._grep_file(filename, regex)
-            for result in file_results:
-                yield result
-
-    def _grep_file(self, filename, regex):
-        """
-        Grep a file.
 
-        Takes as it's arguments a full path to a file, and a regular expression
-        to search for. It returns a generator that yields a GrepperItem for
-        each cycle, that contains the path, line number and matches data.
-        """
-        try:
-            with open(filename) as fp:
-                # simple guess for binaries
-                if '\0' in fp.read(4096):
-                    return
-                fp.seek(0)
-                for linenumber, line in enumerate(fp):
-
-                    line_matches = regex.findall(line)
-
-                    if line_matches:
-                        self._result_count += 1
-                        # enumerate is 0 based, line numbers are 1 based
-                        yield GrepperItem(filename, self, linenumber+1, line, line_matches)
-        except IOError:
-            pass
+    @property
+    def _indexer(self):
+        if self.current_project is not None:
+            return self.current_project.indexer
+
+    def _files_to_grep(self, top, recursive, show_hidden):
+        indexer = self._indexer
+        if indexer is not None:
+            files = indexer.iter_files(top, recursive, show_hidden)
+            if files is not None:
+                return list(files)
+        # not part of the project, walk the directories
+        if not recursive:
+            names = [name for name in sorted(os.listdir(top))
+                     if show_hidden or not name.startswith('.')]
+            return [path for path in (os.path.join(top, x) for x in names)
+                    if os.path.isfile(path)]
+        filenames = []
+        for root, dirs, files in os.walk(top):
+            # Remove hidden directories
+            if os.path.basename(root).startswith('.') and not show_hidden:
+                del dirs[:]
+                continue
+            for name in sorted(files):
+                if show_hidden or not name.startswith('.'):
+                    filenames.append(os.path.join(root, name))
+        return filenames
 
     def set_current_project(self, project):
+        self.current_project = project
         self.current_project_source_directory = project.source_directory
         #self.set_view_location(project.source_directory)
 
@@ -440,6 +431,7 @@ class Grepper(Service):
     def stop(self):
         for view in self._views:
             view.stop()
+        self.engine.stop()
 
 
 Service = Grepper
@@ -0,0 +1,131 @@
+# -*- coding: utf-8 -*-
+"""
+    Grep engine of the grepper service.
+
+    Files are handed out to a pool of worker processes in chunks. A worker
+    maps the whole file and runs a single regex pass over it, line numbers
+    and per line matches are only computed for lines with a hit.
+
+    :copyright: 2005-2010 by The PIDA Project
+    :license: GPL 2 or later (see README/COPYING/LICENSE)
+"""
+
+import re
+import mmap
+import multiprocessing
+
+# number of files sent to a worker at once
+CHUNK_SIZE = 16
+# searches of fewer files are not worth the trip to the workers
+POOL_THRESHOLD = 32
+# how much of a file is checked for null bytes
+BINARY_PROBE = 4096
+
+
+def grep_file(filename, regex):
+    """
+    Grep a file.
+
+    Returns None for binary files, otherwise a list of
+    (linenumber, line, matches) tuples, one for every line with a match.
+    `matches` is the result of `regex.findall(line)`, just like a line by
+    line search would give.
+    """
+    try:
+        with open(filename, 'rb') as fp:
+            try:
+                data = mmap.mmap(fp.fileno(), 0, access=mmap.ACCESS_READ)
+            except ValueError:
+                # empty files can't be mapped
+                return []
+    except EnvironmentError:
+        return []
+
+    try:
+        # simple guess for binaries
+        if '\0' in data[:BINARY_PROBE]:
+            return None
+        # ^ and $ have to match at every line like they did per line
+        whole = re.compile(regex.pattern, regex.flags | re.MULTILINE)
+        results = []
+        size = len(data)
+        pos = 0
+        counted = 0
+        linenumber = 1
+        while pos < size:
+            match = whole.search(data, pos)
+            if match is None:
+                break
+            start = data.rfind('\n', 0, match.start()) + 1
+            end = data.find('\n', match.start())
+            if end == -1:
+                end = size
+            else:
+                end += 1
+            linenumber += data[counted:start].count('\n')
+            counted = start
+            line = data[start:end]
+            # the match may have crossed the line end
+            matches = regex.findall(line)
+            if matches:
+                results.append((linenumber, line, matches))
+            pos = end
+        return results
+    finally:
+        data.close()
+
+
+def _grep_job(job):
+    filename, pattern, flags = job
+    return filename, grep_file(filename, re.compile(pattern, flags))
+
+
+class GrepEngine(object):
+    """
+    Greps lists of files in a pool of worker processes.
+
+    The pool is started on first use and kept for the next searches.
+    """
+
+    def __init__(self, processes=None):
+        self.processes = processes
+        self._pool = None
+
+    def search(self, filenames, regex, is_stopped=None):
+        """
+        Iterate (filename, results) for `filenames`, in no particular order.
+
+        `results` is None for binary files and the result of
+        :func:`grep_file` otherwise.
+
+        :param is_stopped: optional callable, the search is cancelled as
+                           soon as it returns True
+        """
+        if len(filenames) < POOL_THRESHOLD:
+            for filename in filenames:
+                if is_stopped is not None and is_stopped():
+                    return
+                yield filename, grep_file(filename, regex)
+            return
+
+        if self._pool is None:
+            self._pool = multiprocessing.Pool(self.processes)
+        jobs = [(filename, regex.pattern, regex.flags)
+                for filename in filenames]
+        finished = False
+        try:
+            for result in self._pool.imap_unordered(_grep_job, jobs,
+                                                    CHUNK_SIZE):
+                if is_stopped is not None and is_stopped():
+                    return
+                yield result
+            finished = True
+        finally:
+            if not finished:
+                # drop the queued chunks instead of finishing them
+                self.stop()
+
+    def stop(self):
+        if self._pool is not None:
+            self._pool.terminate()
+            self._pool = None
@@ -0,0 +1,58 @@
+import re
+
+from .search import grep_file, GrepEngine, POOL_THRESHOLD
+
+
+def test_grep_file(tmpdir):
+    path = tmpdir.join('test.py')
+    path.write('import os\n\ndef foo():\n    os.foo(os)\nfoo()')
+    results = grep_file(str(path), re.compile('foo'))
+    assert results == [
+        (3, 'def foo():\n', ['foo']),
+        (4, '    os.foo(os)\n', ['foo']),
+        (5, 'foo()', ['foo']),
+    ]
+    assert grep_file(str(path), re.compile('bar')) == []
+
+
+def test_grep_file_per_line(tmpdir):
+    path = tmpdir.join('test.txt')
+    path.write('ab\ncd\nab cd\n')
+    # anchors work per line, matches don't cross lines
+    assert grep_file(str(path), re.compile('^cd')) == [(2, 'cd\n', ['cd'])]
+    assert grep_file(str(path), re.compile(r'b\s+c')) == \
+        [(3, 'ab cd\n', ['b c'])]
+    assert grep_file(str(path), re.compile('(a)b')) == [
+        (1, 'ab\n', ['a']),
+        (3, 'ab cd\n', ['a']),
+    ]
+
+
+def test_grep_file_special(tmpdir):
+    empty = tmpdir.join('empty')
+    empty.write('')
+    binary = tmpdir.join('binary')
+    binary.write('foo\0bar')
+    assert grep_file(str(empty), re.compile('foo')) == []
+    assert grep_file(str(binary), re.compile('foo')) is None
+    assert grep_file(str(tmpdir.join('missing')), re.compile('foo')) == []
+
+
+def test_engine(tmpdir):
+    names = []
+    for i in range(POOL_THRESHOLD * 2):
+        path = tmpdir.join('file%d' % i)
+        path.write('line\nmatch %d\n' % i)
+        names.append(str(path))
+    engine = GrepEngine(processes=2)
+    try:
+        found = dict(engine.search(names, re.compile('match')))
+        assert sorted(found) == sorted(names)
+        assert found[names[3]] == [(2, 'match 3\n', ['match'])]
+
+        stopped = list(engine.search(names, re.compile('match'),
+                                     is_stopped=lambda: True))
+        assert stopped == []
+        assert engine._pool is None
+    finally:
+        engine.stop()
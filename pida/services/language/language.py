@@ -27,7 +27,7 @@ from pida.utils.addtypes import PriorityList
 # core
 #from pida.core.service import Service
 from pida.core.languages import (LanguageService, LanguageServiceFeaturesConfig,
-                                 MergeCompleter)
+                                 MergeCompleter, JobScheduler)
 from pida.core.events import EventsConfig
 from pida.core.actions import (ActionsConfig, TYPE_TOGGLE,
                                TYPE_REMEMBER_TOGGLE, TYPE_MENUTOOL, TYPE_NORMAL)
@@ -627,6 +627,8 @@ class Language(LanguageService):
         self._view_outliner = BrowserView(self)
         self._view_validator = ValidatorView(self)
         self.current_type = None
+        # runs the outliner and validator jobs
+        self.jobs = JobScheduler()
         # add default language info
         self.features.subscribe('info', None, LanguageInfo)
 
@@ -634,6 +636,9 @@ class Language(LanguageService):
         # in the beginning
         self.load_priority_lists()
 
+    def stop(self):
+        self.jobs.stop()
+
     def show_validator(self):
         self.boss.cmd('window', 'add_view', paned='Plugin', view=self._view_validator)
 
@@ -820,6 +825,8 @@ class Language(LanguageService):
         # wo do nothing if we are not started yet
         if not self.started or not document:
             return
+        # nobody waits for the results of the previous document anymore
+        self.jobs.focus(document)
         doctypes = self.doctypes.types_by_filename(document.filename)
         self.current_type = doctypes
         if not doctypes:
@@ -24,7 +24,6 @@ from .outlinefilter import FILTERMAP
 from pida.core.environment import on_windows
 from pida.core.languages import LANGUAGE_PLUGIN_TYPES
 
-from pygtkhelpers.gthreads import GeneratorTask
 
 # ui
 from pida.ui.views import PidaView
@@ -180,8 +179,6 @@ class ValidatorView(PidaView):
     def create_ui(self):
         self._last_selected = None
         self.document = None
-        self.tasks = {}
-        self.restart = False
         self.errors_ol = ObjectList([
             Column('markup', use_markup=True)
         ])
@@ -207,44 +204,15 @@ class ValidatorView(PidaView):
         self.add_main_widget(self.sort_combo, expand=False)
 
     def set_validator(self, validator, document):
-        # this is quite an act we have to do here because of the many cornercases
-        # 1. Jobs once started run through. This is for caching purpuses as a validator
-        # is supposed to cache results, somehow.
-        # 2. buffers can switch quite often and n background jobs are still 
-        # running
-
-        # set the old task job to default priorty again
-        old = self.tasks.get(self.document, None)
-        if old:
-            old.priority = PRIO_LOW
-
+        # jobs are coalesced by the scheduler of the service: a new job for
+        # the document replaces the old one and jobs of documents that lost
+        # the focus are cancelled, so switching buffers never piles up work
         self.document = document
         self.clear()
 
-        if self.tasks.has_key(document):
-            # set the priority of the current validator higher, so it feels 
-            # faster on the current view
-            if self.svc.boss.window.paned.is_visible_pane(self.pane):
-                prio = PRIO_FOREGROUND
-            else:
-                prio = PRIO_DEFAULT
-            self.tasks[document].priorty = prio
-            # when restart is set, the set_validator is run again so the 
-            # list gets updated from the validator cache. this happens when
-            # the buffer switched to another file and back again
-            self.restart = True
-            self.svc.log.debug(_('Validator task for {doc} already running'),
-                               doc=document)
-            return
-
-        self.restart = False
-
         if validator:
 
             def wrap_add_node(document, *args):
-                # we need this proxy function as a task may be still running in 
-                # background and the document already switched
-                # this way we still can fill up the cache by letting the task run
                 # sometimes args have a lengh of 0 so we have to catch this
                 if self.document == document and args:
                     item = args[0]
@@ -254,29 +222,16 @@ class ValidatorView(PidaView):
                             if item.lineno == self._last_selected[1]:
                                 self.errors_ol.selected_item = item
 
-            def on_complete(document, validator):
-                del self.tasks[document]
-                # refire the task and hope the cache will just display stuff,
-                # elsewise the task is run again
-                validator.sync()
-
-                if document == self.document and self.restart:
-                    self.set_validator(validator, document)
-
-            radd = partial(wrap_add_node, document)
-            rcomp = partial(on_complete, document, validator)
-
-            if self.svc.boss.window.paned.is_visible_pane(self. pane):
+            if self.svc.boss.window.paned.is_visible_pane(self.pane):
                 prio = PRIO_FOREGROUND
             else:
                 prio = PRIO_DEFAULT
 
-            task = GeneratorTask(validator.run_cached, 
-                                 radd,
-                                 complete_callback=rcomp,
-                                 priority=prio)
-            self.tasks[document] = task
-            task.start()
+            self.svc.jobs.schedule(document, 'validator',
+                                   validator.run_cached,
+                                   partial(wrap_add_node, document),
+                                   complete_callback=validator.sync,
+                                   priority=prio)
 
     def add_node(self, node):
         if node:
@@ -313,8 +268,6 @@ class BrowserView(PidaView):
 
     def create_ui(self):
         self.document = None
-        self.tasks = {}
-        self.restart = False
         self.source_tree.set_columns([
             Column(title='name', cells=[
                 Cell('icon_name', use_stock=True),
@@ -388,72 +341,32 @@ class BrowserView(PidaView):
 
     def set_outliner(self, outliner, document):
         # see comments on set_validator
-
-        old = self.tasks.get(self.document, None)
-        if old:
-            old.priority = PRIO_DEFAULT
-
         self.document = document
         self.clear()
 
-        if document in self.tasks:
-            # set the priority of the current validator higher, so it feels 
-            # faster on the current view
-            if self.svc.boss.window.paned.is_visible_pane(self.pane):
-                prio = PRIO_FOREGROUND
-            else:
-                prio = PRIO_DEFAULT
-            self.tasks[document].priorty = prio
-            # when restart is set, the set_validator is run again so the 
-            # list gets updated from the validator cache. this happens when
-            # the buffer switched to another file and back again
-            self.restart = True
-            self.svc.log.debug(_('Outliner task for {doc} already running'),
-                               doc=document)
-            return
-
-        self.restart = False
-
         if outliner:
-#            if self.task:
-#                self.task.stop()
-#            self.task = GeneratorTask(outliner.get_outline_cached, self.add_node)
-#            self.task.start()
-
 
             def wrap_add_node(document, *args):
-                # we need this proxy function as a task may be still running in 
-                # background and the document already switched
-                # this way we still can fill up the cache by letting the task run
                 # sometimes args have a lengh of 0 so we have to catch this
                 if self.document == document and args:
                     self.add_node(*args)
 
-            def on_complete(document, outliner):
-                del self.tasks[document]
+            def on_complete(outliner):
                 outliner.sync()
                 # fire refilter so the list is updated after buffer changed
                 self.filter_model.refilter()
-                # refire the task and hope the cache will just display stuff,
-                # elsewise the task is run again
-                if document == self.document and self.restart:
-                    self.set_outliner(outliner, document)
-
-
-            radd = partial(wrap_add_node, document)
-            rcomp = partial(on_complete, document, outliner)
 
             if self.svc.boss.window.paned.is_visible_pane(self.pane):
                 prio = PRIO_FOREGROUND
             else:
                 prio = PRIO_DEFAULT
 
-            task = GeneratorTask(outliner.run_cached,
-                                 radd,
-                                 complete_callback=rcomp,
-                                 priority=prio)
-            self.tasks[document] = task
-            task.start()
+            self.svc.jobs.schedule(document, 'outliner',
+                                   outliner.run_cached,
+                                   partial(wrap_add_node, document),
+                                   complete_callback=partial(on_complete,
+                                                             outliner),
+                                   priority=prio)
 
 
     def clear(self):
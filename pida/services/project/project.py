@@ -79,10 +79,15 @@ class ProjectEventsConfig(EventsConfig):
             self.menu_deactivated)
         self.subscribe_foreign('buffer', 'document-saved',
             self.on_document_saved)
+        self.subscribe_foreign('filewatcher', 'files_changed',
+            self.on_files_changed)
 
     def on_document_saved(self, document):
         self.svc.update_index_file(document.filename)
 
+    def on_files_changed(self, changed, removed):
+        self.svc.update_index(changed, removed)
+
     def editor_started(self):
         self.svc.set_last_project()
 
@@ -605,6 +610,13 @@ class ProjectService(Service):
         if self._current:
             self._current.indexer.index_path(path)
 
+    def update_index(self, changed, removed):
+        """
+        Updates the index of the files reported by the filewatcher
+        """
+        if self._current:
+            self._current.indexer.process_changes(changed, removed)
+
     def refresh_project(self):
         """
         Updates the project cache database
@@ -6,7 +6,9 @@
 
 
 import subprocess
+import threading
 
+import gobject
 from pygtkhelpers.gthreads import GeneratorTask
 
 class GeneratorSubprocessTask(GeneratorTask):
@@ -43,3 +45,86 @@ class GeneratorSubprocessTask(GeneratorTask):
             pass
 
 
+class _Batch(object):
+    """Items of one run of a BatchedGeneratorTask waiting for the main loop"""
+
+    def __init__(self):
+        self.items = []
+        self.lock = threading.Lock()
+        self.cancelled = False
+
+    def take(self):
+        with self.lock:
+            items = self.items
+            self.items = []
+        return items
+
+
+class BatchedGeneratorTask(GeneratorTask):
+    """
+    A Generator Task that hands the yielded items to the main loop in lists
+
+    The items of the generator are collected and `loop_callback` gets
+    called with a list of them, at most `delay` seconds after the first
+    one was yielded or as soon as `batch_size` are waiting. A generator
+    producing thousands of items thus causes a handful of view updates
+    instead of one main loop callback per item.
+
+    An example (inside thread_inited gtk main loop):
+        def work(top):
+            for name in os.listdir(top):
+                yield name
+        task = BatchedGeneratorTask(work, object_list.extend)
+        task.start('/tmp')
+
+    Each item is passed as yielded, tuples are not unpacked.
+    """
+
+    priority = gobject.PRIORITY_DEFAULT_IDLE
+
+    def __init__(self, work_callback, loop_callback, complete_callback=None,
+                 batch_size=500, delay=0.1, pass_generator=False):
+        GeneratorTask.__init__(self, self._collect, None, complete_callback,
+                               pass_generator=True)
+        self._batched_work = work_callback
+        self._batched_loop = loop_callback
+        self._pass_generator_to_work = pass_generator
+        self.batch_size = batch_size
+        self.delay = delay
+        self._batch = None
+
+    def _collect(self, *args, **kwargs):
+        del kwargs['generator_task']
+        if self._pass_generator_to_work:
+            kwargs['generator_task'] = self
+        batch = self._batch = _Batch()
+        delay = int(self.delay * 1000)
+        for item in self._batched_work(*args, **kwargs):
+            if self.is_stopped:
+                batch.cancelled = True
+                break
+            with batch.lock:
+                batch.items.append(item)
+                waiting = len(batch.items)
+            if waiting == 1:
+                gobject.timeout_add(delay, self._flush, batch,
+                                    priority=self.priority)
+            elif waiting == self.batch_size:
+                gobject.idle_add(self._flush, batch, priority=self.priority)
+        else:
+            # queued before the complete callback of the GeneratorTask
+            gobject.idle_add(self._flush, batch, priority=self.priority)
+        # the items only travel through the batches, so the GeneratorTask
+        # gets nothing to iterate
+        return ()
+
+    def _flush(self, batch):
+        items = batch.take()
+        if items and not batch.cancelled:
+            self._batched_loop(items)
+        return False
+
+    def stop(self):
+        GeneratorTask.stop(self)
+        if self._batch is not None:
+            self._batch.cancelled = True
@@ -0,0 +1,103 @@
+from pida.core.projects import Project
+from pida.core.filefinder import (FileFinder, score, is_refinement,
+                                  TIER_PREFIX, TIER_BASENAME, TIER_PATH,
+                                  TIER_FUZZY)
+
+
+FILES = [
+    'pida/core/indexer.py',
+    'pida/core/filefinder.py',
+    'pida/core/languages.py',
+    'pida/services/filemanager/filemanager.py',
+    'pida/services/filewatcher/filewatcher.py',
+    'pida-plugins/quickopen/quickopen.py',
+    'pida-plugins/quickopen/test_qopen.py',
+    'tests/core/test_project.py',
+    'README',
+]
+
+
+def pytest_funcarg__project(request):
+    tmpdir = request.getfuncargvalue('tmpdir')
+    for name in FILES:
+        tmpdir.ensure(name)
+    Project.create_blank_project_file('test', str(tmpdir))
+    project = Project(str(tmpdir))
+    project.indexer.index(recrusive=True)
+    return project
+
+
+def search(project, query, **kw):
+    return [x.relpath for x in project.indexer.finder.search(query, **kw)]
+
+
+def test_score():
+    assert score('pida/core/indexer.py', ['ind'])[0] == TIER_PREFIX
+    assert score('pida/core/indexer.py', ['dex'])[0] == TIER_BASENAME
+    assert score('pida/core/indexer.py', ['core'])[0] == TIER_PATH
+    assert score('pida/core/indexer.py', ['pcidx'])[0] == TIER_FUZZY
+    # the weakest token decides
+    assert score('pida/core/indexer.py', ['ind', 'pcx'])[0] == TIER_FUZZY
+    # boundaries and shorter paths win
+    assert score('a/x_bc', ['bc']) > score('a/xbc', ['bc'])
+    assert score('a/b_c', ['bc']) > score('a/abc', ['ac'])
+    assert score('a/bc', ['bc']) > score('a/bc_long', ['bc'])
+
+
+def test_is_refinement():
+    assert is_refinement(['fo'], ['foo'])
+    assert is_refinement(['foo'], ['foo', 'bar'])
+    assert is_refinement(['foo', 'ba'], ['foo', 'bar'])
+    assert not is_refinement(['foo'], ['fo'])
+    assert not is_refinement(['foo', 'bar'], ['fob', 'bar'])
+    assert not is_refinement([], ['foo'])
+
+
+def test_ranking(project):
+    assert search(project, 'quick')[:2] == [
+        'pida-plugins/quickopen/quickopen.py',
+        'pida-plugins/quickopen/test_qopen.py']
+    assert search(project, 'fw')[0] == \
+        'pida/services/filewatcher/filewatcher.py'
+    assert search(project, 'idx') == ['pida/core/indexer.py']
+    assert search(project, 'INDEXER') == ['pida/core/indexer.py']
+    assert search(project, 'core py')[0] == 'pida/core/indexer.py'
+    assert search(project, 'zzz') == []
+    assert search(project, 'fio', limit=1) == []
+    # directories are never returned
+    assert 'pida/core' not in search(project, 'core')
+
+
+def test_limit_and_accept(project):
+    assert len(search(project, 'py', limit=2)) == 2
+    found = search(project, 'py', accept=lambda item: 'test' in item.basename)
+    assert sorted(found) == ['pida-plugins/quickopen/test_qopen.py',
+                             'tests/core/test_project.py']
+    assert 'README' in search(project, '')
+
+
+def test_refinement(project):
+    finder = project.indexer.finder
+    assert len(search(project, 'fi')) == 3
+    assert finder._last.fuzzy is not None
+    assert search(project, 'fil', limit=2) == [
+        'pida/core/filefinder.py',
+        'pida/services/filemanager/filemanager.py']
+    assert search(project, 'filew') == \
+        ['pida/services/filewatcher/filewatcher.py']
+
+
+def test_follows_index(project, tmpdir):
+    assert search(project, 'newmodule') == []
+    tmpdir.ensure('pida', 'newmodule.py')
+    project.indexer.index_path(str(tmpdir.join('pida', 'newmodule.py')))
+    assert search(project, 'newmod') == ['pida/newmodule.py']
+
+    tmpdir.join('pida', 'core').remove(rec=True)
+    project.indexer.index('pida', recrusive=True)
+    assert search(project, 'indexer') == []
+    assert search(project, 'newmo') == ['pida/newmodule.py']
+
+    project.indexer.save_cache()
+    project.indexer.load_cache()
+    assert search(project, 'newmo') == ['pida/newmodule.py']
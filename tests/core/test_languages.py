@@ -1,12 +1,17 @@
 
 #from pida.core.doctype import DocType
 #from pida.core.testing import test, assert_equal, assert_notequal
-from pida.core.languages import Outliner
+import threading
+import time
+
+from pida.core.languages import Outliner, JobScheduler, PRIO_FOREGROUND
 from pida.services.language.language import (CustomLanguageMapping,
     CustomLanguagePrioList, LanguageService)
 from pida.services.language import DOCTYPES
 from pida.services.language.disabled import NoopOutliner
 
+from pida.utils.testing import refresh_gui
+
 from .test_services import MockBoss
 
 from unittest import TestCase
@@ -210,3 +215,71 @@ class LanguageTest(TestCase):
         self.assertEqual(TestOutliner2.uuid(),
                          'tests.core.test_languages.TestOutliner2')
 
+
+
+class FakeDocument(object):
+    def __init__(self, unique_id):
+        self.unique_id = unique_id
+
+
+class JobSchedulerTest(TestCase):
+
+    def setUp(self):
+        self.scheduler = JobScheduler(max_running=1)
+        self.doc1 = FakeDocument(1)
+        self.doc2 = FakeDocument(2)
+        self.release = threading.Event()
+        self.items = []
+        self.done = []
+
+    def tearDown(self):
+        self.release.set()
+        self.scheduler.stop()
+
+    def blocking(self, name):
+        def work():
+            yield name
+            self.release.wait(5)
+            yield name
+        return work
+
+    def schedule(self, document, feature, name, **kw):
+        return self.scheduler.schedule(document, feature, self.blocking(name),
+                                       self.items.append,
+                                       lambda: self.done.append(name), **kw)
+
+    def wait(self, count):
+        end = time.time() + 5
+        while len(self.done) < count and time.time() < end:
+            refresh_gui(0.01)
+
+    def test_coalesce(self):
+        first = self.schedule(self.doc1, 'outliner', 'first')
+        self.schedule(self.doc2, 'outliner', 'waiting')
+        replaced = self.schedule(self.doc2, 'outliner', 'replaced')
+        self.schedule(self.doc2, 'outliner', 'last')
+        self.assertEqual(self.scheduler.running, 1)
+        self.assertEqual(self.scheduler.pending, 1)
+        self.assertTrue(replaced.cancelled)
+        self.assertFalse(first.cancelled)
+        self.release.set()
+        self.wait(2)
+        self.assertEqual(self.done, ['first', 'last'])
+        self.assertEqual(self.items, ['first'] * 2 + ['last'] * 2)
+
+    def test_focus(self):
+        self.scheduler.focus(self.doc1)
+        other = self.schedule(self.doc2, 'validator', 'other')
+        self.schedule(self.doc1, 'validator', 'mine')
+        focused = self.schedule(self.doc1, 'outliner', 'focused')
+        self.assertEqual(focused.priority, PRIO_FOREGROUND)
+        self.scheduler.focus(self.doc1)
+        # the running job of the other document is cancelled and frees
+        # its slot
+        self.assertTrue(other.cancelled)
+        self.assertEqual(self.scheduler.running, 1)
+        self.assertEqual(self.scheduler.pending, 1)
+        self.release.set()
+        self.wait(2)
+        self.assertEqual(sorted(self.done), ['focused', 'mine'])
+        self.assertFalse('other' in self.done)
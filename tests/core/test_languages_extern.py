@@ -1,4 +1,6 @@
 import os
+import time
+import signal
 #from pida.core.doctype import DocType
 #from pida.core.testing import test, assert_equal, assert_notequal
 from pida.utils.languages import OutlineItem, ValidationError, Definition, \
@@ -82,6 +84,7 @@ def pytest_funcarg__svc(request):
     boss = MockBoss()
     svc = MYService(boss)
     svc.create_all()
+    request.addfinalizer(svc.jobserver.stop)
     return svc
 
 
@@ -165,3 +168,42 @@ def test_definer(svc, doc):
             assert isinstance(v, Definition)
             assert i - 3 == v.offset
             assert "run %s" % (i - 3) == v.line
+
+
+def pytest_funcarg__docs(request):
+    svc = request.getfuncargvalue('svc')
+    doc = request.getfuncargvalue('doc')
+    return [doc, Document(svc.boss, __file__), Document(svc.boss, __file__)]
+
+
+def outliner_pid(svc, doc):
+    return list(svc.outliner_factory(svc, doc).run())[0]
+
+
+def test_jobserver_affinity(svc, docs):
+    pids = [outliner_pid(svc, doc) for doc in docs]
+    # new documents are spread over max_processes processes
+    assert pids[0] != pids[1]
+    assert pids[2] in pids[:2]
+    # and stick to them
+    assert [outliner_pid(svc, doc) for doc in docs] == pids
+
+    stats = svc.jobserver.stats()
+    assert sorted(x['pid'] for x in stats) == sorted(set(pids))
+    assert sum(x['documents'] for x in stats) == 3
+    assert sum(x['jobs'] for x in stats) == 6
+    assert [x['pending'] for x in stats] == [0, 0]
+    assert all(x['latency'] > 0 for x in stats)
+
+
+def test_jobserver_crash(svc, doc):
+    pid = outliner_pid(svc, doc)
+    worker = svc.jobserver.get_worker(svc.outliner_factory(svc, doc))
+    os.kill(pid, signal.SIGKILL)
+    end = time.time() + 5
+    while worker.alive and time.time() < end:
+        time.sleep(0.01)
+
+    new_pid = outliner_pid(svc, doc)
+    assert new_pid != pid
+    assert svc.jobserver.stats()[0]['restarts'] == 1
@@ -260,3 +260,136 @@ def test_query(project, tmpdir):
                     'src/source2.h', 'src/test2',
                     ]
 
+
+
+def test_process_changes(project, tmpdir):
+    make_project_files(tmpdir)
+    project.indexer.index(recrusive=True)
+    c = project.indexer.cache
+
+    tmpdir.ensure('src', 'new.c')
+    tmpdir.ensure('newdir', 'deep', 'file.c')
+    tmpdir.join('lib', 'readme').remove()
+    tmpdir.join('lib', 'bla').remove(rec=True)
+    project.indexer.process_changes(
+        changed=[str(tmpdir.join('src', 'new.c')),
+                 str(tmpdir.join('newdir')),
+                 str(tmpdir.join('outside', '..', '..', 'elsewhere'))],
+        removed=[str(tmpdir.join('lib', 'readme')),
+                 str(tmpdir.join('lib', 'bla'))])
+
+    assert c['files']['src/new.c'].doctype == 'C'
+    assert 'new.c' in c['paths']['src'].children
+    # new directories are indexed with their content
+    assert 'newdir/deep/file.c' in c['files']
+    assert c['dirs']['newdir/deep'].children.keys() == ['file.c']
+
+    assert 'lib/readme' not in c['paths']
+    assert 'lib/bla' not in c['paths']
+    assert 'lib/bla/readme' not in c['paths']
+    assert 'bla' not in c['dirnames']
+    assert 'readme' not in c['filenames']
+    assert sorted(c['paths']['lib'].children) == ['CVS', 'Makefile']
+
+    # a changed event for a vanished file removes it
+    tmpdir.join('src', 'new.c').remove()
+    project.indexer.process_changes(changed=[str(tmpdir.join('src', 'new.c'))])
+    assert 'src/new.c' not in c['paths']
+    assert 'new.c' not in c['filenames']
+
+
+def test_cache_snapshot_rescan(project, tmpdir):
+    make_project_files(tmpdir)
+    project.indexer.index(recrusive=True)
+    project.indexer.save_cache()
+    before = sorted(project.indexer.cache['paths'])
+
+    # an unchanged tree is restored, the metadata dir gained the snapshot
+    assert project.indexer.load_cache()
+    after = sorted(project.indexer.cache['paths'])
+    after.remove('.pida-metadata/FILECACHE')
+    assert after == before
+
+    # only directories with a different mtime get rescanned
+    tmpdir.join('lib', 'readme').remove()
+    tmpdir.ensure('lib', 'added', 'file.h')
+    os.utime(str(tmpdir.join('lib')), (1, 1))
+    tmpdir.join('src', 'test2').remove(rec=True)
+    os.utime(str(tmpdir.join('src')), (1, 1))
+    assert project.indexer.load_cache()
+    c = project.indexer.cache
+    assert 'lib/readme' not in c['paths']
+    assert 'lib/added/file.h' in c['files']
+    assert c['files']['lib/added/file.h'].doctype == 'C'
+    assert 'src/test2' not in c['paths']
+    assert c['files']['src/source.c'].doctype == 'C'
+    assert c['paths']['src/source2.h'] == c['filenames']['source2.h'][0]
+
+    # a snapshot from an older version is thrown away
+    from pida.core.indexer import CACHE_NAME
+    path = project.get_meta_dir(filename=CACHE_NAME)
+    fp = open(path, 'w')
+    fp.write('garbage')
+    fp.close()
+    assert not project.indexer.load_cache()
+    assert not os.path.exists(path)
+
+
+def test_filestore():
+    from pida.core.indexer import FileStore, FLAG_USED, FLAG_DIR, FLAG_FILE
+    store = FileStore()
+    root = store.add(None, '', FLAG_USED | FLAG_DIR, 1.0)
+    src = store.add(root, 'src', FLAG_USED | FLAG_DIR, 2.0)
+    one = store.add(src, 'one.c', FLAG_USED | FLAG_FILE, 3.0, 'C')
+    store.add(root, 'one.c', FLAG_USED | FLAG_FILE, 4.0, 'C')
+    assert store.lookup('src/one.c') == one
+    assert store.relpath(one) == os.path.join('src', 'one.c')
+    assert len(store.by_name['one.c']) == 2
+    assert [path for id_, path in store.walk()] == ['', 'one.c', 'src',
+                                                    'src/one.c']
+
+    store.remove(src)
+    assert len(store) == 2
+    assert store.lookup('src') is None
+    assert store.by_name['one.c'] != [one]
+    # freed slots are reused
+    lib = store.add(root, 'lib', FLAG_USED | FLAG_DIR, 5.0)
+    assert lib in (src, one)
+
+    copy = FileStore()
+    copy.load(store.dump())
+    assert [x for x in copy.walk()] == [x for x in store.walk()]
+    assert copy.doctype_names[copy.doctypes[copy.lookup('one.c')]] == 'C'
+    assert copy.mtimes[copy.lookup('lib')] == 5.0
+    assert len(copy) == 3
+
+
+def test_iter_files(project, tmpdir):
+    from pida.core.indexer import FLAG_BINARY
+    make_project_files(tmpdir)
+    indexer = project.indexer
+    indexer.index(recrusive=True)
+    src = str(tmpdir.join('src'))
+
+    def files(path, *k, **kw):
+        return [x[len(str(tmpdir)) + 1:]
+                for x in indexer.iter_files(path, *k, **kw)]
+
+    assert files(src, recursive=False) == [
+        'src/Makefile', 'src/skript.sh', 'src/source.c', 'src/source2.c',
+        'src/source2.h']
+    assert 'lib/bla/readme' in files(str(tmpdir))
+    assert '.hiddenfile' not in files(str(tmpdir))
+    assert '.hiddenfile' in files(str(tmpdir), hidden=True)
+    assert indexer.iter_files('/not/in/the/project') is None
+    assert indexer.iter_files(str(tmpdir.join('LICENSE'))) is None
+
+    # binary files are skipped until they change again
+    binary = str(tmpdir.join('src', 'source.c'))
+    indexer.mark_binary(binary)
+    assert 'src/source.c' not in files(src)
+    copy = type(indexer.store)()
+    copy.load(indexer.store.dump())
+    assert not copy.flags[copy.lookup('src/source.c')] & FLAG_BINARY
+    indexer.index_path(binary)
+    assert 'src/source.c' in files(src)
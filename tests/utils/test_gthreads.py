@@ -0,0 +1,35 @@
+import time
+
+from pida.utils.testing import refresh_gui
+from pida.utils.gthreads import BatchedGeneratorTask
+
+
+def run_task(work, *args, **kw):
+    batches = []
+    done = []
+    task = BatchedGeneratorTask(work, batches.append,
+                                lambda: done.append(True), **kw)
+    task.start(*args)
+    end = time.time() + 5
+    while not done and time.time() < end:
+        refresh_gui(0.01)
+    assert done
+    return task, batches
+
+
+def test_batches():
+    def work(count):
+        for i in xrange(count):
+            yield i
+
+    task, batches = run_task(work, 1000, batch_size=100, delay=1)
+    assert sum(batches, []) == range(1000)
+    assert 1 < len(batches) <= 11
+
+
+def test_pass_generator():
+    def work(generator_task=None):
+        yield generator_task
+
+    task, batches = run_task(work, pass_generator=True)
+    assert batches == [[task]]
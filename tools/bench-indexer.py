@@ -0,0 +1,156 @@
+"""
+Compare the memory use and load time of the columnar FileStore against the
+old dict of FileInfo objects layout of the project indexer, and time the
+quick open file finder while a query is typed.
+
+    python tools/bench-indexer.py [number of files]
+
+Every layout is measured in a fresh interpreter so the resident memory
+numbers don't influence each other.
+"""
+import os
+import sys
+import time
+import subprocess
+from collections import defaultdict
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from pida.core.indexer import FileStore, FLAG_USED, FLAG_DIR, FLAG_FILE
+from pida.core.filefinder import FileFinder
+
+EXTENSIONS = ['.py', '.c', '.h', '.txt', '.rst', '']
+DOCTYPES = {'.py': 'Python', '.c': 'C', '.h': 'C', '.rst': 'Rst'}
+
+
+class LegacyFileInfo(object):
+    # the per file object the indexer used to keep
+    def __init__(self, relpath, is_dir, mtime):
+        self.relpath = relpath
+        self.basename = os.path.basename(relpath)
+        self.dirname = os.path.dirname(relpath)
+        self.ext = os.path.splitext(self.basename)[1]
+        self.doctype = DOCTYPES.get(self.ext)
+        self.is_dir = is_dir
+        self.is_file = not is_dir
+        self.mtime = mtime
+        self.children = {}
+
+
+def fake_tree(count, per_dir=40):
+    """Yields (relpath, is_dir) of a synthetic project, parents first"""
+    yield '', True
+    dirs = ['']
+    made = 0
+    while made < count:
+        parent = dirs.pop(0)
+        for i in range(per_dir / 4):
+            path = os.path.join(parent, 'pkg%d' % i)
+            dirs.append(path)
+            yield path, True
+        for i in range(per_dir):
+            yield os.path.join(parent, 'module%d%s' % (
+                i, EXTENSIONS[i % len(EXTENSIONS)])), False
+            made += 1
+
+
+def build_legacy(count):
+    cache = {
+        'paths': {},
+        'dirs': {},
+        'files': {},
+        'filenames': defaultdict(list),
+        'dirnames': defaultdict(list),
+    }
+    for relpath, is_dir in fake_tree(count):
+        info = LegacyFileInfo(relpath, is_dir, 1234567890.0)
+        cache['paths'][relpath] = info
+        if is_dir:
+            cache['dirs'][relpath] = info
+            cache['dirnames'][info.basename].append(info)
+        else:
+            cache['files'][relpath] = info
+            cache['filenames'][info.basename].append(info)
+        if relpath:
+            cache['paths'][info.dirname].children[info.basename] = info
+    return cache
+
+
+def build_columnar(count):
+    store = FileStore()
+    ids = {}
+    for relpath, is_dir in fake_tree(count):
+        if is_dir:
+            flags = FLAG_USED | FLAG_DIR
+        else:
+            flags = FLAG_USED | FLAG_FILE
+        parent = None
+        if relpath:
+            parent = ids[os.path.dirname(relpath)]
+        id_ = store.add(parent, os.path.basename(relpath), flags,
+                        1234567890.0,
+                        DOCTYPES.get(os.path.splitext(relpath)[1]))
+        if is_dir:
+            ids[relpath] = id_
+    return store
+
+
+def rss_kb():
+    with open('/proc/self/statm') as fp:
+        return int(fp.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 1024
+
+
+def measure(layout, count):
+    before = rss_kb()
+    if layout == 'legacy':
+        data = build_legacy(count)
+        dump = lambda: data
+        load = lambda raw: raw
+    else:
+        data = build_columnar(count)
+        dump = data.dump
+        load = FileStore().load
+    memory = rss_kb() - before
+
+    raw = pickle.dumps(dump(), pickle.HIGHEST_PROTOCOL)
+    start = time.time()
+    load(pickle.loads(raw))
+    load_time = time.time() - start
+    print '%-10s memory %8d KiB  snapshot %8d KiB  load %6.3f s' % (
+        layout, memory, len(raw) / 1024, load_time)
+
+
+def measure_finder(count, queries=('mod', 'pkg3 mod1', 'p3m17')):
+    finder = FileFinder(build_columnar(count))
+    start = time.time()
+    finder.search('')
+    print 'finder     build %6.3f s' % (time.time() - start)
+    for query in queries:
+        times = []
+        for end in range(1, len(query) + 1):
+            start = time.time()
+            finder.search(query[:end])
+            times.append((time.time() - start) * 1000)
+        print 'finder     %-10r per keystroke %s ms' % (
+            query, ' '.join('%.1f' % x for x in times))
+
+
+def main():
+    if len(sys.argv) > 2:
+        if sys.argv[1] == 'finder':
+            measure_finder(int(sys.argv[2]))
+        else:
+            measure(sys.argv[1], int(sys.argv[2]))
+        return
+    count = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    print 'indexing %d synthetic files' % count
+    for layout in 'legacy', 'columnar', 'finder':
+        subprocess.call([sys.executable, __file__, layout, str(count)])
+
+
+if __name__ == '__main__':
+    main()